@@ -26,16 +26,69 @@
     v1.0 = Final Public Beta - CURRENT STABLE BUILD
 '''
 # I - Import and Initialize
-import pygame, pyBoxheadSprites, random
+import pygame, os, random, time, pyBoxheadSim, pyBoxheadTiming, pyBoxheadProfiler, pyBoxheadWaves, pyBoxheadAudio, pyBoxheadReplay, pyBoxheadRender, pyBoxheadInput, pyBoxheadMemory, pyBoxheadArena, pyBoxheadQuality
+from pyBoxheadAssets import assets
 pygame.init()
 pygame.mixer.init()
 
+# The game rules always run 30 steps per second. The screen is drawn up to
+# RENDER_FPS times per second, and with VSYNC set, in step with the monitor
+# refresh as well. 0 draws as fast as possible and keeps a whole core busy;
+# it is only meant for benchmarking.
+SIMULATION_RATE = 30
+RENDER_FPS = 60
+VSYNC = False
+# With PROFILE set the frame profiler runs from the start. It can also be
+# switched on and off with F3, and F4 saves the recorded frames to
+# PROFILE_FILE.csv and PROFILE_FILE.json (a Chrome trace).
+PROFILE = False
+PROFILE_FILE = "pyBoxhead_profile"
+# JSON wave table to play (see pyBoxheadWaves.DEFAULT_WAVES), or None for
+# the default waves.
+WAVES_FILE = None
+# Prebuilt asset bundle (see pyBoxheadBundle) read while the intro screen is
+# up. Without it the assets are decoded from their own files instead.
+BUNDLE_FILE = "pyBoxhead.bundle"
+# Every game's seed and joystick input is recorded to a file in this
+# directory, to be replayed with pyBoxheadReplay.py. None turns it off.
+RECORD_DIR = "recordings"
+# "surface" draws with software blits, as the game always has. "texture"
+# draws with the SDL2 GPU renderer, scaling the 638x553 game to WINDOW_SIZE
+# (None for 638x553) or to the whole screen with FULLSCREEN; it falls back
+# to "surface" where it cannot be used.
+RENDERER = "surface"
+WINDOW_SIZE = None
+FULLSCREEN = False
+# CSV file to log the time from every joystick input to the display update
+# showing it, or None. A summary is printed when the game ends.
+INPUT_LOG = None
+# With MEMORY_MONITOR set, memory is sampled every 30 seconds and at every
+# wave (see pyBoxheadMemory), and sites that grew every wave are printed
+# when the game ends. F5 writes a memory report to MEMORY_FILE, starting
+# the monitor first if it is not running.
+MEMORY_MONITOR = False
+MEMORY_FILE = "pyBoxhead_memory.txt"
+# (width, height) of a large arena to play on, with the screen following the
+# player (see pyBoxheadArena), or None for the one screen game. Arena games
+# are not recorded, as replays are played on one screen.
+ARENA_SIZE = None
+# "straight": zombies walk straight up to the barricade, as they always
+# have. "flow": they follow a flow field to the barricade, or to the player
+# when the player is nearer (see pyBoxheadFlow). Flow games are not
+# recorded either.
+ZOMBIE_PATHING = "straight"
+# With GOVERNOR set, quality is lowered step by step while frames take
+# longer than a simulation step, and given back once they are fast again
+# (see pyBoxheadQuality). Time spent at each level is printed at the end.
+GOVERNOR = True
+
 def intro_screen():
     ''' This function is used to display a introductory screen, creating a
     game loop before the main game loop'''
     # D - Display configuration
-    pygame.display.set_caption("pyBoxhead Public Beta")
-    screen = pygame.display.set_mode((638, 553))      
+    renderer = pyBoxheadRender.open_renderer(RENDERER, "pyBoxhead Public Beta",
+                                             WINDOW_SIZE, FULLSCREEN, VSYNC)
+    screen = renderer.screen
     
     # E - Entities      
     
@@ -47,13 +100,18 @@ def intro_screen():
         joysticks.append(stick)    
     
     # Original Background
-    background = pygame.image.load("introscreen.png")
-    background = background.convert()
+    background = assets.opaque_image("introscreen.png")
     screen.blit(background, (0, 0))  
     
     # Begin Game Sound-Effect
     begin_game = pygame.mixer.Sound("guncock.wav")
     begin_game.set_volume(1)
+    
+    # The game's assets are decoded on a worker thread while the intro
+    # screen waits for the player, with a loading bar along the bottom.
+    preloader = assets.preload(bundle=assets.path(BUNDLE_FILE))
+    loading_bar = pygame.Rect(0, 0, 300, 6)
+    loading_bar.midbottom = (319, 545)
     # Action (broken into ALTER steps)
     
     # A - Assign Values
@@ -70,29 +128,51 @@ def intro_screen():
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 keepGoing = False
-                return joysticks, screen, keepGoing
+                return joysticks, renderer, keepGoing
             if event.type == pygame.JOYHATMOTION or event.type == pygame.JOYBUTTONDOWN: 
                 begin_game.play()
-                return joysticks, screen, keepGoing
+                # Anything still loading is finished before the game starts.
+                preloader.join()
+                return joysticks, renderer, keepGoing
+        
+        # Loading bar, gone once everything is loaded
+        if preloader.is_alive() or loading_bar.width:
+            screen.blit(background, loading_bar, loading_bar)
+            if preloader.is_alive():
+                filled = loading_bar.copy()
+                filled.width = int(loading_bar.width * preloader.progress())
+                pygame.draw.rect(screen, (193, 1, 1), loading_bar, 1)
+                screen.fill((193, 1, 1), filled)
+            else:
+                loading_bar.width = 0
             
         # R - Refresh Display
-        pygame.display.flip()
+        renderer.show()
     
         
                 
+def start_profiler(simulation):
+    '''This function attaches a new frame profiler to the simulation, shows
+    its overlay on top of the game, and returns the profiler and overlay.'''
+    profiler = pyBoxheadProfiler.FrameProfiler()
+    profiler.start_recording()
+    simulation.profiler = profiler
+    overlay = pyBoxheadProfiler.ProfilerOverlay(profiler)
+    simulation.allSprites.add(overlay, layer=6)
+    return profiler, overlay
+
 def main():
     '''This function defines the 'mainline logic' for our pyPong game.'''
     
-    # The introductory screen is called. Joysticks, display configuration
-    # and keepGoing state is received from the intro_screen function.
+    # The introductory screen is called. Joysticks, the renderer and
+    # keepGoing state is received from the intro_screen function.
     
-    joysticks, screen, keepGoing = intro_screen()
+    joysticks, renderer, keepGoing = intro_screen()
+    screen = renderer.screen
     
     # E - Entities
     
-    background = pygame.image.load("boxheadbg.png")
-    background = background.convert()
-    screen.blit(background, (0, 0))
+    background = assets.opaque_image("boxheadbg.png")
     
     # Background Music
     background_music = pygame.mixer.music.load("escalation.mp3")
@@ -100,50 +180,53 @@ def main():
     pygame.mixer.music.play(-1) 
     
     # Sound Effects
-    gameover_voice = pygame.mixer.Sound("gameover.wav")
-    gameover_voice.set_volume(1)
-    explosion_sound = pygame.mixer.Sound("explosion.wav")
-    explosion_sound.set_volume(0.8)
-    gun_shot = pygame.mixer.Sound("gunshot.wav")
-    gun_shot.set_volume(0.3)
-    player_death = pygame.mixer.Sound("gameoverdeath.wav")
-    player_death.set_volume(1)
-    next_wave = pygame.mixer.Sound("waveeffect.wav")
-    next_wave.set_volume(1)
-    
-    
-    # Single appearing sprites instantiated.
-    player = pyBoxheadSprites.Player(screen)
-    endzone = pyBoxheadSprites.EndZone(screen)
-    health_level = pyBoxheadSprites.PlayerKeeper()
-    wall_level = pyBoxheadSprites.WallKeeper()
-    wave_level = pyBoxheadSprites.WaveKeeper()
-    game_over = pyBoxheadSprites.GameOver()
+    # Sound effects are played through the voice manager, by the names the
+    # simulation reports (see pyBoxheadAudio.GAME_SOUNDS).
+    voices = pyBoxheadAudio.game_voices()
     
-    #Sprite group for sprites that appear more than once are created.
-    zombieGroup = pygame.sprite.Group()
-    bulletGroup = pygame.sprite.Group()
-    explosionGroup = pygame.sprite.Group()
-    
-    # Sprites that appear on the screen and do not change location are grouped together.
-    stationarySprites = pygame.sprite.OrderedUpdates(endzone, health_level, wall_level, wave_level)
-    allSprites = pygame.sprite.OrderedUpdates(stationarySprites, player)
+    # The simulation holds every sprite and the rules of the game.
+    waves = None
+    if WAVES_FILE:
+        waves = pyBoxheadWaves.load_wave_table(WAVES_FILE)
+    # The seed is chosen here, so the game can be recorded and replayed.
+    seed = random.randrange(2 ** 32)
+    arena = None
+    if ARENA_SIZE:
+        arena = pyBoxheadArena.Arena(ARENA_SIZE)
+    simulation = pyBoxheadSim.Simulation(screen, seed, waves=waves, arena=arena, pathing=ZOMBIE_PATHING)
+    recorder = None
+    if RECORD_DIR and keepGoing and not arena and ZOMBIE_PATHING == "straight":
+        if not os.path.isdir(RECORD_DIR):
+            os.makedirs(RECORD_DIR)
+        recording_file = os.path.join(RECORD_DIR, time.strftime("pyBoxhead-%Y%m%d-%H%M%S.pbr"))
+        recorder = pyBoxheadReplay.Recorder(recording_file, seed, waves)
+    # Sprites are drawn between their last two positions when the screen is
+    # drawn between two simulation steps. At or below the simulation rate
+    # there is nothing to draw between, and moving sprites are only redrawn
+    # when they move.
+    simulation.interpolate = RENDER_FPS == 0 or RENDER_FPS > SIMULATION_RATE
+    renderer.start_game(simulation, background)
     
     # A - Action (broken into ALTER steps)
 
     # A - Assign values to key variables
     clock = pygame.time.Clock()
-    zombies_killed = 0
-    # Initial zombie spawning chance set, explained during event handling.
-    spawning_chance = 50
-    # Variables created to keep track whether this is the first time the player
-    # has killed the pre-requisite amount of zombies required for the next wave.
-    firstWaveAchievement = True
-    secondWaveAchievement = True
-    thirdWaveAchievement = True
-    fourthWaveAchievement = True
-    fifthWaveAchievement = True
-    sixthWaveAchievement = True
+    timestep = pyBoxheadTiming.FixedStep(SIMULATION_RATE)
+    # Joystick input is read right before every simulation step. Only the
+    # event types handled here are let into the queue.
+    controls = pyBoxheadInput.InputLayer(joysticks, INPUT_LOG)
+    controls.allow()
+    # Frame profiler and its overlay, None while profiling is off.
+    profiler = None
+    overlay = None
+    if PROFILE:
+        profiler, overlay = start_profiler(simulation)
+    governor = None
+    if GOVERNOR:
+        governor = pyBoxheadQuality.QualityGovernor(1000.0 / SIMULATION_RATE)
+    memory = None
+    if MEMORY_MONITOR:
+        memory = pyBoxheadMemory.MemoryMonitor()
     # keepGoing is passed from intro_screen, and is not found here.
     # if the user exits in the intro screen, main gameloop is skipped. 
     # If they decide to play, main game loop executes
@@ -154,140 +237,97 @@ def main():
     #  L - Loop
     while keepGoing:
          
+        if profiler:
+            profiler.begin_frame()
         # T - Timer to set frame rate
-        clock.tick(30)
+        clock.tick(RENDER_FPS)
+        # The time the last frame took to run, leaving out any sleep.
+        if governor and governor.frame(clock.get_rawtime()):
+            governor.apply(simulation, voices)
+        if profiler:
+            profiler.mark("tick")
       
         # E - Event handling, Player uses joystick only
-        for event in pygame.event.get():
+        # Joystick events are kept by the input layer for the next step: the
+        # d-pad selection is passed to the change direction func, and every
+        # button press fires a bullet.
+        for event in controls.poll():
             if event.type == pygame.QUIT:
                 keepGoing = False
-            if event.type == pygame.JOYHATMOTION:
-                # Tuple of the d-pad selection is passed to the change direction func.
-                player.change_direction(event.value)
-            if event.type == pygame.JOYBUTTONDOWN:  
-                # If the player presses any button on the controller, a bullet
-                # is created and added to the bullet list. allSprites is recreated
-                # to add the bullets.
-                bullet = pyBoxheadSprites.Bullet(screen, player.rect.centerx, player.rect.bottom)
-                bulletGroup.add(bullet)
-                allSprites = pygame.sprite.OrderedUpdates(stationarySprites, player, zombieGroup, bulletGroup, explosionGroup)
-                gun_shot.play()
-         
-        # Zombie Spawning Mechanics Below
-        # For every time the game loop refreshes, a random number is generated.
-        # If the number 7 is selected, a zombie is spawned. 
-        
-        # To keep track of the chance of zombie spawning, every time a zombie is 
-        # killed, it is tracked. The more that are killed, the more that the 
-        # range is reduced, increasing zombie spawn chances.
+            if event.type == pygame.KEYDOWN:
+                # Developer keys: F3 toggles the profiler, F4 saves its frames.
+                if event.key == pygame.K_F3:
+                    if profiler:
+                        overlay.kill()
+                        simulation.profiler = profiler = overlay = None
+                    else:
+                        profiler, overlay = start_profiler(simulation)
+                        profiler.begin_frame()
+                if event.key == pygame.K_F4 and profiler:
+                    profiler.export_csv(PROFILE_FILE + ".csv")
+                    profiler.export_chrome_trace(PROFILE_FILE + ".json")
+                # F5 writes a memory report.
+                if event.key == pygame.K_F5:
+                    if not memory:
+                        memory = pyBoxheadMemory.MemoryMonitor()
+                    memory.sample(simulation)
+                    memory.dump(MEMORY_FILE)
+        if profiler:
+            profiler.mark("events")
         
-        if random.randrange(1, spawning_chance) == 7:
-            # Zombie x position is randomly generated to make sure that the
-            # player cannot predict where the zombies spawn.
-            x_pos = random.randrange(20, 620)
-            zombie = pyBoxheadSprites.Zombie(screen, x_pos)
-            # Zombie is added to the zombie group.
-            zombieGroup.add(zombie)
-            allSprites = pygame.sprite.OrderedUpdates(stationarySprites, player, zombieGroup, bulletGroup, explosionGroup)
-        
-        
-        # Based on the number of zombies killed, the spawning range is reduced
-        # and the wave increase sound effect is played, along with the
-        # new wave level being displayed to the user.
-        if zombies_killed == 20 and firstWaveAchievement:
-            spawning_chance = 45
-            wave_level.wave_increase()
-            next_wave.play()
-            firstWaveAchievement = False
-        if zombies_killed == 35 and secondWaveAchievement:
-            spawning_chance = 40
-            wave_level.wave_increase()  
-            next_wave.play()
-            secondWaveAchievement = False
-        if zombies_killed == 50 and thirdWaveAchievement:
-            spawning_chance = 35
-            wave_level.wave_increase()  
-            next_wave.play()
-            thirdWaveAchievement = False
-        if zombies_killed == 75 and fourthWaveAchievement:
-            spawning_chance = 30
-            wave_level.wave_increase()
-            next_wave.play()
-            fourthWaveAchievement = False 
-        if zombies_killed == 100 and fifthWaveAchievement:
-            spawning_chance = 25
-            wave_level.wave_increase()
-            next_wave.play()
-            fifthWaveAchievement = False
-        if zombies_killed == 125 and sixthWaveAchievement:
-            spawning_chance = 20
-            wave_level.wave_increase()
-            next_wave.play()
-            sixthWaveAchievement = False            
-
-        # Collision Detection (Bullet on Zombie)
-        # Explosion is created at zombie location, zombie and bullet are killed.
-        for bullet in bulletGroup:
-            zombie_bullet_hitList = pygame.sprite.spritecollide(bullet, zombieGroup, False)
-            for items in zombie_bullet_hitList:
-                explosion = pyBoxheadSprites.Explosion(screen, bullet.rect.centerx, bullet.rect.centery)
-                explosionGroup.add(explosion)
-                allSprites = pygame.sprite.OrderedUpdates(stationarySprites, player, zombieGroup, bulletGroup, explosionGroup)
-                explosion_sound.play()
-                items.kill()
-                bullet.kill()
-                zombies_killed += 1
-                
-        #Collision Detection (Wall on Zombie)
-        # Explosion is created at zombie location, zombie is killed.
-        for zombie in zombieGroup:
-            if zombie.rect.colliderect(endzone):
-                explosion = pyBoxheadSprites.Explosion(screen, zombie.rect.centerx, zombie.rect.centery)
-                explosionGroup.add(explosion)
-                allSprites = pygame.sprite.OrderedUpdates(stationarySprites, player, zombieGroup, bulletGroup, explosionGroup)
-                explosion_sound.play()
-                zombie.kill()
-                wall_level.wall_hit()
-        
-        #Collision Detection (Player on Zombie)
-        # Explosion is created at zombie location, zombie is killed, player takes damage.
-        for zombie in zombieGroup:
-            if zombie.rect.colliderect(player):
-                explosion = pyBoxheadSprites.Explosion(screen, zombie.rect.centerx, zombie.rect.centery)
-                explosionGroup.add(explosion)
-                allSprites = pygame.sprite.OrderedUpdates(stationarySprites, player, zombieGroup, bulletGroup, explosionGroup)
-                explosion_sound.play()
-                zombie.kill()  
-                health_level.player_hit()
-                
-        # If the health_level meets the death condition, explosion is created
-        # at player location, kill the player, play player death sound effect,
-        # stop the main game loop.
-        if health_level.death():
-            explosion = pyBoxheadSprites.Explosion(screen, player.rect.centerx, player.rect.centery)
-            explosionGroup.add(explosion)
-            # This time when rebuilding allsprites, add game_over sprite.
-            allSprites = pygame.sprite.OrderedUpdates(stationarySprites, player, zombieGroup, bulletGroup, explosionGroup, game_over)
-            player_death.play()
-            player.kill()
-            keepGoing = False
-        
-        # If the wall_level meets the death condition, add game_over sprites 
-        # when rebuilding all sprites, play game over sound effect, stop main game loop.
-            allSprites = pygame.sprite.OrderedUpdates(stationarySprites, player, zombieGroup, bulletGroup, explosionGroup, game_over)  
-            gameover_voice.play()
-            keepGoing = False            
-                
+        # Spawning, waves, collisions and movement are handled by the simulation,
+        # once for every 1/30 of a second that has passed.
+        for step in range(timestep.advance(pygame.time.get_ticks())):
+            hat, shots = controls.take()
+            if recorder:
+                # The governor's zombie cap changes the game, so a replay
+                # must repeat it.
+                recorder.limit(simulation.tick + 1, simulation.zombie_limit)
+            state = simulation.step(hat, shots)
+            if recorder:
+                recorder.record(state["tick"], hat, shots)
+            if memory:
+                memory.tick(simulation)
+            for sound in state["sounds"]:
+                voices.play(sound)
+            # If the player or the wall has died, stop the main game loop.
+            if state["finished"]:
+                keepGoing = False
+                break
+        # Sounds triggered this frame are merged and played together.
+        voices.flush()
+        if profiler:
+            profiler.mark("sounds")
         
         # R - Refresh display
-        # Background must be blitted because of layering issues
-        screen.blit(background, (0, 0))
-        allSprites.clear(screen, background)
-        allSprites.update()
-        allSprites.draw(screen)       
-        pygame.display.flip()
+        if overlay:
+            overlay.update()
+        renderer.draw_game(simulation, timestep.alpha())
+        if profiler:
+            profiler.mark("draw")
+        renderer.present()
+        controls.shown()
+        if profiler:
+            profiler.mark("display")
+            profiler.end_frame()
         
           
+    if recorder:
+        recorder.close(simulation.state())
+    if governor:
+        metrics = governor.metrics()
+        print("quality level %s at the end, %d changes: %s" % (metrics["name"], metrics["changes"], ", ".join(
+            ["%s %.1f s" % (name, metrics["seconds"][name]) for name, settings in governor.levels])))
+    if memory:
+        for site, size in memory.growth():
+            print("memory grew every wave: %+d bytes at %s" % (size, site))
+    if INPUT_LOG:
+        controls.close()
+        latency = controls.stats()
+        for kind in ("hat", "button"):
+            print("%s input to display: %d shown, mean %.1f ms, p95 %.1f ms, worst %.1f ms" % (
+                kind, latency[kind]["count"], latency[kind]["mean"], latency[kind]["p95"], latency[kind]["max"]))
+          
      # Unhide the mouse pointer
     pygame.mouse.set_visible(True)
   
@@ -0,0 +1,219 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Large scrolling arenas for pyBoxhead.
+
+    An Arena is a playing field larger than the screen. Sprites are placed
+    on it as they are on the screen: the Arena answers get_width() and
+    get_height() like a screen surface, so the barricade is along its top,
+    zombies come up from its bottom edge, and bullets fly down to it.
+
+    A Camera follows the player, and only what it sees is drawn. The
+    background is built from boxheadbg.png: its barricade band along the
+    top of the arena, its ground tiled over the middle, and its bottom band
+    along the bottom. It is cut into square chunks, converted to the display
+    format and kept (up to max_chunks), so a frame only blits the few chunks
+    in view whatever the arena size. The chunks in view and WARM_RING
+    chunks around them are built before play starts; during play, at most
+    WARM_BUDGET chunks a frame are built in that ring, ahead of the camera,
+    so scrolling does not stop to convert a chunk. The bottom band with the
+    HUD stays fixed to the bottom of the screen.
+
+'''
+import collections, pygame
+from pyBoxheadAssets import assets
+
+# Rows of boxheadbg.png: the barricade band at the top, the ground, and
+# the band at the bottom that holds the HUD.
+TOP_BAND = 65
+BOTTOM_BAND = 102
+# Chunks around the view built ahead of the camera, and the most of them
+# built in one frame.
+WARM_RING = 1
+WARM_BUDGET = 1
+
+class Arena(object):
+    '''This class defines the playing field of a large arena, in place of
+    the screen surface the sprites are placed on.'''
+    def __init__(self, size, chunk_size=256, max_chunks=64):
+        '''This initializer takes the (width, height) of the arena in pixels,
+        the size of the square background chunks, and the most chunks kept
+        converted at once.'''
+        self.rect = pygame.Rect((0, 0), size)
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.__background = None
+
+    def get_width(self):
+        '''This method returns the width of the arena.'''
+        return self.rect.width
+
+    def get_height(self):
+        '''This method returns the height of the arena.'''
+        return self.rect.height
+
+    def get_size(self):
+        '''This method returns the size of the arena.'''
+        return self.rect.size
+
+    def get_rect(self):
+        '''This method returns the rect of the whole arena.'''
+        return pygame.Rect(self.rect)
+
+    def background(self):
+        '''This method returns the chunked background of the arena, loading
+        it the first time.'''
+        if self.__background is None:
+            self.__background = ChunkedBackground(assets.opaque_image("boxheadbg.png"), self.rect.size,
+                                                  self.chunk_size, self.max_chunks)
+        return self.__background
+
+class Camera(object):
+    '''This class defines the part of the arena shown on the screen.'''
+    def __init__(self, view_size, world_size):
+        '''This initializer takes the size of the screen and of the arena.'''
+        self.view = pygame.Rect((0, 0), view_size)
+        self.world = pygame.Rect((0, 0), world_size)
+
+    def view_at(self, center):
+        '''This method returns the view centred on a point, kept inside the
+        arena.'''
+        view = pygame.Rect(self.view)
+        view.center = center
+        return view.clamp(self.world)
+
+    def follow(self, center):
+        '''This method moves the view to centre on a point, e.g. the
+        player.'''
+        self.view = self.view_at(center)
+
+    def place(self, sequence):
+        '''This method takes (image, world topleft[, area]) tuples, leaves out
+        those outside the view, and returns the rest at their screen
+        position.'''
+        view = self.view
+        left, top, right, bottom = view.left, view.top, view.right, view.bottom
+        placed = []
+        for item in sequence:
+            image, (x, y) = item[0], item[1]
+            area = item[2] if len(item) > 2 else None
+            width, height = area.size if area else image.get_size()
+            if x < right and y < bottom and x + width > left and y + height > top:
+                placed.append((image, (x - left, y - top), area))
+        return placed
+
+class ChunkedBackground(object):
+    '''This class draws the background of an arena from square chunks.'''
+    def __init__(self, source, world_size, chunk_size=256, max_chunks=64):
+        '''This initializer takes the screen-sized background the arena's is
+        built from, the size of the arena, the size of the chunks and the
+        most chunks kept converted.'''
+        self.__source = source
+        self.world = pygame.Rect((0, 0), world_size)
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        width, height = source.get_size()
+        # (first arena row, last arena row, first source row, last source
+        # row) of every band, the middle one tiled down the arena.
+        self.__bands = ((0, TOP_BAND, 0, TOP_BAND),
+                        (TOP_BAND, self.world.height - BOTTOM_BAND, TOP_BAND, height - BOTTOM_BAND),
+                        (self.world.height - BOTTOM_BAND, self.world.height, height - BOTTOM_BAND, height))
+        # The bottom band, drawn fixed to the bottom of the screen under the HUD.
+        self.panel = self.__convert(source.subsurface((0, height - BOTTOM_BAND, width, BOTTOM_BAND)).copy())
+        # Converted chunks by (column, row), least recently seen first.
+        self.__chunks = collections.OrderedDict()
+        self.built = 0
+        # Chunks that were not built ahead, and were built as they came in
+        # view.
+        self.missed = 0
+
+    def __convert(self, surface):
+        '''This method converts a surface to the display format, if there is
+        a display.'''
+        if pygame.display.get_surface() is not None:
+            return surface.convert()
+        return surface
+
+    def __paint(self, chunk, area):
+        '''This method paints the part of the arena under area on a chunk.'''
+        source = self.__source
+        period = source.get_width()
+        for world_top, world_bottom, source_top, source_bottom in self.__bands:
+            band = pygame.Rect(area.left, world_top, area.width, world_bottom - world_top).clip(area)
+            if not band.height:
+                continue
+            rows = source_bottom - source_top
+            y = band.top
+            while y < band.bottom:
+                source_y = source_top + (y - world_top) % rows
+                height = min(source_bottom - source_y, band.bottom - y)
+                x = band.left
+                while x < band.right:
+                    source_x = x % period
+                    width = min(period - source_x, band.right - x)
+                    chunk.blit(source, (x - area.left, y - area.top), (source_x, source_y, width, height))
+                    x += width
+                y += height
+
+    def __build(self, column, row):
+        '''This method builds the chunk at a column and row, and keeps it
+        in place of the least recently seen chunk when there are max_chunks
+        already.'''
+        size = self.chunk_size
+        area = pygame.Rect(column * size, row * size, size, size).clip(self.world)
+        chunk = pygame.Surface(area.size)
+        self.__paint(chunk, area)
+        chunk = self.__convert(chunk)
+        self.built += 1
+        while len(self.__chunks) >= self.max_chunks:
+            self.__chunks.popitem(False)
+        self.__chunks[(column, row)] = chunk
+        return chunk
+
+    def chunk(self, column, row):
+        '''This method returns the chunk at a column and row, building it
+        if it was not built ahead.'''
+        key = (column, row)
+        chunk = self.__chunks.pop(key, None)
+        if chunk is None:
+            self.missed += 1
+            return self.__build(column, row)
+        self.__chunks[key] = chunk
+        return chunk
+
+    def warm(self, view, ring=WARM_RING, budget=None):
+        '''This method builds the chunks the view sees and the ring chunks
+        around it that are not built yet, nearest the view first, at most
+        budget of them (None for all). It returns the number built.'''
+        size = self.chunk_size
+        columns = range(max(view.left // size - ring, 0),
+                        min((view.right - 1) // size + ring, (self.world.width - 1) // size) + 1)
+        rows = range(max(view.top // size - ring, 0),
+                     min((view.bottom - 1) // size + ring, (self.world.height - 1) // size) + 1)
+        chunks = self.__chunks
+        missing = [(column, row) for row in rows for column in columns if (column, row) not in chunks]
+        if not missing:
+            return 0
+        centre_x = view.centerx / float(size) - 0.5
+        centre_y = view.centery / float(size) - 0.5
+        missing.sort(key=lambda key: abs(key[0] - centre_x) + abs(key[1] - centre_y))
+        if budget is not None:
+            missing = missing[:budget]
+        for column, row in missing:
+            self.__build(column, row)
+        return len(missing)
+
+    def sequence(self, view):
+        '''This method returns the (chunk, screen topleft) of every chunk the
+        view sees.'''
+        size = self.chunk_size
+        sequence = []
+        for row in range(view.top // size, (view.bottom - 1) // size + 1):
+            for column in range(view.left // size, (view.right - 1) // size + 1):
+                sequence.append((self.chunk(column, row), (column * size - view.left, row * size - view.top)))
+        return sequence
+
+    def __len__(self):
+        '''This method returns the number of chunks kept.'''
+        return len(self.__chunks)
@@ -0,0 +1,277 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Shared asset registry for pyBoxhead.
+
+    Every image, sound and font used by the game is loaded from disk once and
+    then handed out to every sprite that asks for it, so spawning a Bullet,
+    Zombie or Explosion never touches the disk or decodes a PNG.
+
+    The assets can also be decoded ahead of time on a worker thread, while
+    the intro screen is up, either from the individual files or from a
+    prebuilt bundle (see pyBoxheadBundle).
+
+'''
+import pygame, io, os, threading
+
+# Assets live next to the game scripts, no matter where the game is run from.
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Every asset the game needs after the intro screen, for preloading.
+GAME_ASSETS = ([("image", "boxheadbg.png"),
+                ("image", "player.png"),
+                ("image", "bullet.png"),
+                ("image", "zombie.png")] +
+               [("image", os.path.join("explosions", "explosion%d.png" % frame)) for frame in range(1, 17)] +
+               [("sound", "gameover.wav"),
+                ("sound", "explosion.wav"),
+                ("sound", "gunshot.wav"),
+                ("sound", "gameoverdeath.wav"),
+                ("sound", "waveeffect.wav"),
+                ("font", "zombiefont.ttf", 64),
+                ("font", "zombiefont.ttf", 115)])
+
+class AssetCache(object):
+    '''This class keeps one copy of every loaded asset, and counts how many
+    requests were served from memory (hits) and from disk (misses).'''
+    def __init__(self, asset_dir=ASSET_DIR):
+        '''This initializer takes the directory the assets are loaded from.'''
+        self.__asset_dir = asset_dir
+        self.__images = {}
+        self.__opaque = {}
+        # Images decoded ahead of time, waiting for a display to convert to.
+        self.__decoded = {}
+        # Images the game already asked for, which the worker thread no
+        # longer needs to decode.
+        self.__claimed = set()
+        self.__frames = {}
+        self.__sounds = {}
+        # Sounds handed out at least once, and so given their volume.
+        self.__handed_out = set()
+        self.__fonts = {}
+        # Raw font files from a bundle, keyed by filename.
+        self.__font_data = {}
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    def path(self, *parts):
+        '''This method returns the full path of an asset file.'''
+        return os.path.join(self.__asset_dir, *parts)
+
+    def decode_image(self, key, surface=None):
+        '''This method decodes an image file without converting it, or stores
+        an already decoded surface, for image() to convert later. It is safe
+        to call from a worker thread. An image the game has already loaded
+        for itself is not decoded, or its late result is dropped.'''
+        with self.__lock:
+            if key in self.__claimed:
+                return
+        if surface is None:
+            surface = pygame.image.load(self.path(key))
+        with self.__lock:
+            if key not in self.__claimed:
+                self.__decoded[key] = surface
+
+    def __decoded_image(self, key):
+        '''This method returns the decoded surface for key, counting a hit if
+        it was decoded ahead of time, or a miss if it is loaded now.'''
+        with self.__lock:
+            surface = self.__decoded.pop(key, None)
+            self.__claimed.add(key)
+        if surface is not None:
+            self.__hits += 1
+            return surface
+        self.__misses += 1
+        return pygame.image.load(self.path(key))
+
+    def image(self, *parts):
+        '''This method returns the shared surface for an image file. The image
+        is converted with convert_alpha() once a display mode has been set,
+        which keeps transparency while making every blit faster.'''
+        key = os.path.join(*parts)
+        surface = self.__images.get(key)
+        if surface is not None:
+            self.__hits += 1
+            return surface
+        surface = self.__decoded_image(key)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        self.__images[key] = surface
+        return surface
+
+    def opaque_image(self, *parts):
+        '''This method returns the shared surface for an image without
+        transparency, such as a background, converted with convert().'''
+        key = os.path.join(*parts)
+        surface = self.__opaque.get(key)
+        if surface is not None:
+            self.__hits += 1
+            return surface
+        if key in self.__images:
+            self.__hits += 1
+            surface = self.__images[key]
+        else:
+            surface = self.__decoded_image(key)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        self.__opaque[key] = surface
+        return surface
+
+    def frames(self, directory, prefix, count):
+        '''This method returns a shared tuple of numbered animation frames,
+        e.g. explosions/explosion1.png to explosions/explosion16.png'''
+        key = (directory, prefix, count)
+        frames = self.__frames.get(key)
+        if frames is not None:
+            self.__hits += 1
+            return frames
+        frames = tuple([self.image(directory, prefix + str(current_frame) + ".png")
+                        for current_frame in range(1, count + 1)])
+        self.__frames[key] = frames
+        return frames
+
+    def decode_sound(self, filename, sound=None):
+        '''This method loads a sound file, or stores an already decoded
+        Sound, for sound() to hand out. It is safe to call from a worker
+        thread.'''
+        if sound is None:
+            sound = pygame.mixer.Sound(self.path(filename))
+        with self.__lock:
+            self.__sounds.setdefault(filename, sound)
+
+    def sound(self, filename, volume=1):
+        '''This method returns the shared Sound object for a sound file. The
+        volume is set when the sound is first handed out.'''
+        with self.__lock:
+            sound = self.__sounds.get(filename)
+            first = filename not in self.__handed_out
+            self.__handed_out.add(filename)
+        if sound is not None:
+            self.__hits += 1
+        else:
+            self.__misses += 1
+            sound = pygame.mixer.Sound(self.path(filename))
+            with self.__lock:
+                self.__sounds[filename] = sound
+        if first:
+            sound.set_volume(volume)
+        return sound
+
+    def decode_font(self, filename, size, data=None):
+        '''This method loads a font file at a size, or keeps the raw font file
+        data from a bundle. It is safe to call from a worker thread.'''
+        with self.__lock:
+            if data is not None:
+                self.__font_data[filename] = data
+            if (filename, size) in self.__fonts:
+                return
+        font = self.__open_font(filename, size)
+        with self.__lock:
+            self.__fonts.setdefault((filename, size), font)
+
+    def __open_font(self, filename, size):
+        '''This method opens a font from bundle data if there is some, or
+        from its file.'''
+        data = self.__font_data.get(filename)
+        if data is not None:
+            return pygame.font.Font(io.BytesIO(data), size)
+        return pygame.font.Font(self.path(filename), size)
+
+    def font(self, filename, size):
+        '''This method returns the shared Font object for a font file and size.'''
+        key = (filename, size)
+        with self.__lock:
+            font = self.__fonts.get(key)
+        if font is not None:
+            self.__hits += 1
+            return font
+        self.__misses += 1
+        font = self.__open_font(filename, size)
+        with self.__lock:
+            self.__fonts[key] = font
+        return font
+
+    def preload(self, manifest=GAME_ASSETS, bundle=None):
+        '''This method starts decoding every asset of the manifest on a
+        worker thread, from the bundle file if one is given and usable, and
+        returns the Preloader thread to follow its progress.'''
+        preloader = Preloader(self, manifest, bundle)
+        preloader.start()
+        return preloader
+
+    def stats(self):
+        '''This method returns a dictionary with the cache hit and miss counts
+        and the number of assets currently held.'''
+        return {"hits": self.__hits,
+                "misses": self.__misses,
+                "images": len(self.__images) + len(self.__opaque),
+                "sounds": len(self.__sounds),
+                "fonts": len(self.__fonts)}
+
+    def clear(self):
+        '''This method empties the cache, e.g. after the display mode changes.'''
+        self.__images.clear()
+        self.__opaque.clear()
+        self.__decoded.clear()
+        self.__claimed.clear()
+        self.__frames.clear()
+        self.__sounds.clear()
+        self.__handed_out.clear()
+        self.__fonts.clear()
+        self.__font_data.clear()
+
+class Preloader(threading.Thread):
+    '''This class decodes a list of assets into an AssetCache on a worker
+    thread. Images are only decoded there; they are converted for the
+    display the first time the game asks for them.'''
+    def __init__(self, cache, manifest, bundle=None):
+        '''This initializer takes the cache to fill, the manifest of
+        ("image", file), ("sound", file) and ("font", file, size) entries,
+        and an optional bundle file to read them from.'''
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.__cache = cache
+        self.__manifest = list(manifest)
+        self.__bundle = bundle
+        self.__done = 0
+        self.error = None
+        self.from_bundle = False
+
+    def progress(self):
+        '''This method returns the fraction of the assets loaded so far.'''
+        if not self.__manifest:
+            return 1.0
+        return self.__done / float(len(self.__manifest))
+
+    def run(self):
+        '''This method loads every asset of the manifest.'''
+        try:
+            entries = None
+            if self.__bundle is not None and os.path.exists(self.__bundle):
+                import pyBoxheadBundle
+                entries = pyBoxheadBundle.read_bundle(self.__bundle)
+                self.from_bundle = entries is not None
+            for item in self.__manifest:
+                self.__load(item, entries)
+                self.__done += 1
+        except Exception as error:
+            # Anything not preloaded is simply loaded when the game asks for it.
+            self.error = error
+
+    def __load(self, item, entries):
+        '''This method loads one manifest entry, from the bundle entries if
+        they hold it.'''
+        cache = self.__cache
+        kind, filename = item[0], item[1]
+        entry = entries.get(filename) if entries else None
+        if kind == "image":
+            cache.decode_image(filename, entry)
+        elif kind == "sound":
+            cache.decode_sound(filename, entry)
+        elif kind == "font":
+            cache.decode_font(filename, item[2], entry)
+
+# The process-wide cache shared by every sprite.
+assets = AssetCache()
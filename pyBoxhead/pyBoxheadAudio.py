@@ -0,0 +1,176 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Sound voice manager for pyBoxhead.
+
+    Sound effects are not played straight away. Triggers are collected during
+    the frame and played together at the end of it: identical triggers in
+    the same frame become one louder play, each effect has a limit on how
+    many copies may sound at once (the oldest copy is cut off for a new
+    one), and the cues that must never be lost (next wave, game over,
+    player death) have mixer channels of their own.
+
+'''
+import pygame
+from pyBoxheadAssets import assets
+
+# The game's sound effects: the name the simulation reports, the sound file,
+# its volume, how many copies may play at once, and whether it gets a
+# channel of its own. The wave and game over cues have channels of their
+# own; explosions and gun shots may only stack up a few copies.
+GAME_SOUNDS = (("gameover_voice", "gameover.wav", 1, 1, True),
+               ("player_death", "gameoverdeath.wav", 1, 1, True),
+               ("next_wave", "waveeffect.wav", 1, 1, True),
+               ("explosion_sound", "explosion.wav", 0.8, 4, False),
+               ("gun_shot", "gunshot.wav", 0.3, 3, False))
+
+def game_voices():
+    '''This function returns a VoiceManager with every sound effect of the
+    game registered.'''
+    voices = VoiceManager()
+    for name, filename, volume, limit, reserved in GAME_SOUNDS:
+        voices.add(name, assets.sound(filename, volume), limit, reserved)
+    return voices
+
+class VoiceManager(object):
+    '''This class plays sound effects on pygame.mixer channels with per
+    effect voice limits.'''
+    def __init__(self, channels=16):
+        '''This initializer takes the total number of mixer channels.'''
+        pygame.mixer.set_num_channels(channels)
+        # One Channel object per mixer channel, so the same channel is
+        # always the same object.
+        self.__channels = [pygame.mixer.Channel(number) for number in range(channels)]
+        self.__sounds = {}
+        self.__reserved = {}
+        self.__reserved_count = 0
+        self.__limits = {}
+        self.__volumes = {}
+        self.__voices = {}
+        self.__pending = {}
+        self.__stats = {}
+        # The play number each shared channel last started a sound at, by
+        # channel number, to find the one that has played longest.
+        self.__started = {}
+        self.__plays = 0
+
+    def add(self, name, sound, limit=4, reserved=False):
+        '''This method registers a sound effect under name, with the most
+        copies of it that may play at once. A reserved effect gets a mixer
+        channel of its own that other effects cannot take.'''
+        self.__sounds[name] = sound
+        self.__limits[name] = limit
+        # The volume of the effect is applied through the channel instead, so
+        # merged plays can go above it.
+        self.__volumes[name] = sound.get_volume()
+        sound.set_volume(1.0)
+        self.__voices[name] = []
+        self.__stats[name] = {"triggers": 0, "plays": 0, "merged": 0, "stolen": 0, "peak_voices": 0}
+        if reserved:
+            # Reserved channels are the lowest numbered ones. Other effects
+            # only ever get channels above them from __channel(), as
+            # pygame.mixer.find_channel() does not skip reserved channels.
+            self.__reserved[name] = self.__channels[self.__reserved_count]
+            self.__reserved_count += 1
+            pygame.mixer.set_reserved(self.__reserved_count)
+
+    def limit(self, name):
+        '''This method returns the most copies of name that may play at once.'''
+        return self.__limits[name]
+
+    def set_limit(self, name, limit):
+        '''This method changes the most copies of name that may play at once.
+        Copies over the new limit finish playing.'''
+        self.__limits[name] = limit
+
+    def play(self, name):
+        '''This method asks for a sound effect to be played at the end of the
+        frame.'''
+        self.__pending[name] = self.__pending.get(name, 0) + 1
+        self.__stats[name]["triggers"] += 1
+
+    def flush(self):
+        '''This method plays the sound effects asked for this frame. Several
+        triggers of one effect are merged into one play, louder by the
+        square root of the number of triggers.'''
+        for name, count in self.__pending.items():
+            sound = self.__sounds[name]
+            stats = self.__stats[name]
+            stats["merged"] += count - 1
+            volume = min(1.0, self.__volumes[name] * count ** 0.5)
+            channel = self.__channel(name)
+            if channel is None:
+                continue
+            channel.set_volume(volume)
+            channel.play(sound)
+            stats["plays"] += 1
+        self.__pending.clear()
+
+    def __channel(self, name):
+        '''This method returns the channel to play name on, cutting off the
+        oldest copy of name when its voice limit is reached.'''
+        stats = self.__stats[name]
+        if name in self.__reserved:
+            stats["peak_voices"] = 1
+            return self.__reserved[name]
+        sound = self.__sounds[name]
+        # Forget voices that have finished, or that were taken over.
+        voices = [channel for channel in self.__voices[name]
+                  if channel.get_busy() and channel.get_sound() is sound]
+        if len(voices) >= self.__limits[name]:
+            channel = voices.pop(0)
+            channel.stop()
+            stats["stolen"] += 1
+        else:
+            channel = self.__shared_channel()
+            if channel is None:
+                return None
+            if channel.get_busy():
+                # Every shared channel is busy: the one that has played
+                # longest is cut off.
+                channel.stop()
+                stats["stolen"] += 1
+                # The channel may have been playing this effect already.
+                voices = [voice for voice in voices if voice is not channel]
+        voices.append(channel)
+        self.__voices[name] = voices
+        if len(voices) > stats["peak_voices"]:
+            stats["peak_voices"] = len(voices)
+        return channel
+
+    def __shared_channel(self):
+        '''This method returns a free channel above the reserved ones, or
+        the one of them that started playing longest ago when none is free,
+        or None without any.'''
+        oldest = None
+        for number in range(self.__reserved_count, len(self.__channels)):
+            channel = self.__channels[number]
+            if not channel.get_busy():
+                self.__started_now(number)
+                return channel
+            if oldest is None or self.__started.get(number, -1) < self.__started.get(oldest, -1):
+                oldest = number
+        if oldest is None:
+            return None
+        self.__started_now(oldest)
+        return self.__channels[oldest]
+
+    def __started_now(self, number):
+        '''This method notes that a channel starts a sound now.'''
+        self.__plays += 1
+        self.__started[number] = self.__plays
+
+    def stats(self):
+        '''This method returns, for every effect, how many times it was
+        triggered, played, merged into another play, cut off for a newer
+        copy, the most copies heard at once, and the copies playing now.'''
+        result = {}
+        for name, stats in self.__stats.items():
+            result[name] = dict(stats)
+            if name in self.__reserved:
+                result[name]["voices"] = int(self.__reserved[name].get_busy())
+            else:
+                result[name]["voices"] = len([channel for channel in self.__voices[name]
+                                              if channel.get_busy()])
+        return result
@@ -0,0 +1,246 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Parallel batch simulator for pyBoxhead balance sweeps.
+
+    Runs many headless games across every CPU core, each with its own
+    parameter set and seed, played by a random or scripted player. Every
+    parameter set is tried with the same seeds, so the sets are compared on
+    the same games. Each game's result is appended to a JSON lines file as
+    soon as it is done, and the per set summary (wave reached, kills,
+    survival time, peak entity counts) is rewritten as results come in, so
+    an overnight sweep can be looked at while it runs.
+
+    A sweep is the product of every value given for each parameter:
+
+        python pyBoxheadBatch.py --games 500 --rate-scale 0.8 1 1.25 --player-damage 10 15
+
+    or a JSON file with a list of parameter sets, see DEFAULT_PARAMETERS:
+
+        python pyBoxheadBatch.py --games 500 --sweep sweep.json
+
+    The two cannot be mixed: with --sweep, every parameter comes from the
+    file.
+'''
+import copy, itertools, json, multiprocessing, timeit, pyBoxheadSim, pyBoxheadWaves
+
+# Every parameter of a game, with the values of the original game.
+DEFAULT_PARAMETERS = {
+    # Multiplies the spawn rates of every wave, i.e. the spawn curve.
+    "rate_scale": 1.0,
+    # A whole wave table (see pyBoxheadWaves.DEFAULT_WAVES), or None.
+    "waves": None,
+    "player_damage": 10,
+    "wall_damage": 5,
+    # "random" or "sweep" (see pyBoxheadSim.random_policy/sweep_policy).
+    "policy": "random",
+    "fire_chance": 0.2,
+    "fire_every": 4,
+}
+
+# The dummy screen of a worker process, set up once per process.
+worker_screen = None
+
+def scaled_waves(table, rate_scale):
+    '''This function returns a copy of a wave table with every spawn rate
+    multiplied by rate_scale.'''
+    table = copy.deepcopy(table)
+    for row in table["waves"]:
+        row["spawns_per_second"] *= rate_scale
+    after = table.setdefault("after_last", {})
+    after["max_spawns_per_second"] = after.get(
+        "max_spawns_per_second", pyBoxheadWaves.DEFAULT_WAVES["after_last"]["max_spawns_per_second"]) * rate_scale
+    return table
+
+def sweep(games, seed=0, sets=None, grid=None):
+    '''This function returns the job of every game in a sweep: games games
+    per parameter set, with seeds seed to seed + games - 1. The parameter
+    sets are given as a list of dictionaries, or as a grid: a dictionary
+    from parameter name to the list of values to try.'''
+    if sets is None:
+        sets = [{}]
+        if grid:
+            names = sorted(grid)
+            sets = [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+    jobs = []
+    for number, overrides in enumerate(sets):
+        parameters = dict(DEFAULT_PARAMETERS)
+        parameters.update(overrides)
+        for game in range(games):
+            jobs.append({"set": number, "seed": seed + game, "parameters": parameters})
+    return jobs
+
+def start_worker():
+    '''This function sets up a worker process for headless games.'''
+    global worker_screen
+    worker_screen = pyBoxheadSim.headless_screen()
+
+def run_game(job, max_ticks=36000):
+    '''This function plays one game of a sweep, for at most max_ticks
+    ticks, and returns its result.'''
+    global worker_screen
+    if max_ticks <= 0:
+        raise ValueError("a game needs at least one tick, not %d" % max_ticks)
+    if worker_screen is None:
+        start_worker()
+    parameters = job["parameters"]
+    seed = job["seed"]
+    if parameters["policy"] == "sweep":
+        policy = pyBoxheadSim.sweep_policy(parameters["fire_every"])
+    else:
+        policy = pyBoxheadSim.random_policy(seed, parameters["fire_chance"])
+    table = parameters["waves"] or pyBoxheadWaves.DEFAULT_WAVES
+    if parameters["rate_scale"] != 1.0:
+        table = scaled_waves(table, parameters["rate_scale"])
+    peaks = {"zombies": 0, "bullets": 0, "explosions": 0, "entities": 0}
+    state = None
+    start = timeit.default_timer()
+    for state in pyBoxheadSim.simulate(policy, seed, max_ticks, worker_screen,
+                                       waves=pyBoxheadWaves.WaveTable(table),
+                                       player_damage=parameters["player_damage"],
+                                       wall_damage=parameters["wall_damage"]):
+        entities = state["zombies"] + state["bullets"] + state["explosions"]
+        if entities > peaks["entities"]:
+            peaks["entities"] = entities
+        for kind in ("zombies", "bullets", "explosions"):
+            if state[kind] > peaks[kind]:
+                peaks[kind] = state[kind]
+    if state["player_health"] <= 0:
+        ended = "player"
+    elif state["wall_health"] <= 0:
+        ended = "wall"
+    else:
+        ended = "time"
+    return {"set": job["set"],
+            "seed": seed,
+            "wave": state["wave"],
+            "kills": state["zombies_killed"],
+            "ticks": state["tick"],
+            "survival_s": state["tick"] / 30.0,
+            "ended": ended,
+            "peak_zombies": peaks["zombies"],
+            "peak_bullets": peaks["bullets"],
+            "peak_explosions": peaks["explosions"],
+            "peak_entities": peaks["entities"],
+            "cpu_s": timeit.default_timer() - start}
+
+def run_job(job_and_ticks):
+    '''This function unpacks the arguments of run_game() for the pool.'''
+    return run_game(*job_and_ticks)
+
+class Summary(object):
+    '''This class aggregates game results per parameter set.'''
+    FIELDS = ("wave", "kills", "survival_s", "peak_zombies", "peak_bullets", "peak_explosions", "peak_entities")
+
+    def __init__(self, jobs):
+        '''This initializer takes the jobs of the sweep, to know the
+        parameters of every set.'''
+        self.__sets = {}
+        for job in jobs:
+            if job["set"] not in self.__sets:
+                self.__sets[job["set"]] = {"parameters": job["parameters"], "results": []}
+
+    def add(self, result):
+        '''This method adds the result of one game.'''
+        self.__sets[result["set"]]["results"].append(result)
+
+    def report(self):
+        '''This method returns, for every parameter set, its parameters, the
+        number of games, how the games ended, and the mean, median, minimum
+        and maximum of every result field.'''
+        report = []
+        for number in sorted(self.__sets):
+            results = self.__sets[number]["results"]
+            entry = {"set": number, "parameters": self.__sets[number]["parameters"], "games": len(results)}
+            ended = {}
+            for result in results:
+                ended[result["ended"]] = ended.get(result["ended"], 0) + 1
+            entry["ended"] = ended
+            for field in self.FIELDS:
+                values = sorted([result[field] for result in results])
+                if values:
+                    entry[field] = {"mean": sum(values) / float(len(values)),
+                                    "median": values[len(values) // 2],
+                                    "min": values[0],
+                                    "max": values[-1]}
+            report.append(entry)
+        return report
+
+    def write(self, filename):
+        '''This method writes the report to a JSON file.'''
+        with open(filename, "w") as output:
+            json.dump(self.report(), output, indent=2, sort_keys=True)
+
+def run_sweep(jobs, results_file, summary_file, max_ticks=36000, processes=None, every=100):
+    '''This function plays every job on a pool of processes (one per core by
+    default). Each result is appended to results_file as it comes in, and
+    the summary is rewritten every every results and at the end. It
+    returns the Summary.'''
+    summary = Summary(jobs)
+    pool = multiprocessing.Pool(processes, start_worker)
+    try:
+        with open(results_file, "w") as results:
+            done = 0
+            for result in pool.imap_unordered(run_job, [(job, max_ticks) for job in jobs], 4):
+                results.write(json.dumps(result, sort_keys=True) + "\n")
+                results.flush()
+                summary.add(result)
+                done += 1
+                if done % every == 0:
+                    summary.write(summary_file)
+    except BaseException:
+        # Stop the games still running, e.g. on Ctrl+C.
+        pool.terminate()
+        raise
+    pool.close()
+    pool.join()
+    summary.write(summary_file)
+    return summary
+
+def main():
+    '''This function runs a sweep from the command line.'''
+    import argparse
+    parser = argparse.ArgumentParser(description="Play many headless pyBoxhead games in parallel.")
+    parser.add_argument("--games", type=int, default=100, help="games per parameter set")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game of each set")
+    parser.add_argument("--ticks", type=int, default=36000, help="longest game, in ticks (36000 = 20 minutes)")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (one per core by default)")
+    parser.add_argument("--sweep", help="JSON file with a list of parameter sets")
+    parser.add_argument("--rate-scale", type=float, nargs="+")
+    parser.add_argument("--player-damage", type=int, nargs="+")
+    parser.add_argument("--wall-damage", type=int, nargs="+")
+    parser.add_argument("--policy", choices=("random", "sweep"), nargs="+")
+    parser.add_argument("--fire-chance", type=float, nargs="+")
+    parser.add_argument("--results", default="batch_results.jsonl")
+    parser.add_argument("--summary", default="batch_summary.json")
+    args = parser.parse_args()
+    if args.ticks <= 0:
+        parser.error("--ticks must be at least 1")
+
+    grid = {}
+    for name in ("rate_scale", "player_damage", "wall_damage", "policy", "fire_chance"):
+        if getattr(args, name):
+            grid[name] = getattr(args, name)
+    sets = None
+    if args.sweep:
+        if grid:
+            parser.error("--sweep cannot be combined with %s" % ", ".join(
+                ["--" + name.replace("_", "-") for name in sorted(grid)]))
+        with open(args.sweep) as sweep_file:
+            sets = json.load(sweep_file)
+    jobs = sweep(args.games, args.seed, sets, grid)
+    start = timeit.default_timer()
+    summary = run_sweep(jobs, args.results, args.summary, args.ticks, args.processes)
+    elapsed = timeit.default_timer() - start
+    print("%d games in %.1f s, results in %s, summary in %s" % (len(jobs), elapsed, args.results, args.summary))
+    for entry in summary.report():
+        parameters = dict(entry["parameters"])
+        # A whole wave table is too long to print.
+        parameters.pop("waves")
+        print("set %d %s: wave %.2f, kills %.1f, survival %.1f s, ended %s" % (
+            entry["set"], json.dumps(parameters, sort_keys=True), entry["wave"]["mean"],
+            entry["kills"]["mean"], entry["survival_s"]["mean"], entry["ended"]))
+
+if __name__ == "__main__":
+    main()
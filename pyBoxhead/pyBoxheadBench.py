@@ -0,0 +1,261 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Performance benchmarks for pyBoxhead.
+
+    Each scenario drives a real Simulation (sprites, collisions, pools and the
+    dirty rect renderer) headless through a fixed, seeded load, and times
+    every frame: one simulation step plus one draw. Results are printed and
+    saved as JSON, and can be compared against an earlier run to catch
+    regressions between builds.
+
+    Usage:
+        python pyBoxheadBench.py --output bench.json
+        python pyBoxheadBench.py --baseline bench.json
+'''
+import gc, json, platform, sys, timeit, pygame, pyBoxheadSim, pyBoxheadArena
+from pyBoxheadAssets import assets
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2 has no tracemalloc, allocations are not reported there.
+    tracemalloc = None
+
+class Scenario(object):
+    '''This class defines one benchmark load. setup() prepares a fresh
+    Simulation and tick() feeds it before every frame; both can be
+    overridden. tick() returns the (hat, shots) input for the frame, and
+    report() any results of its own. A scenario with an arena_size plays
+    on a pyBoxheadArena.Arena of that size.'''
+    frames = 300
+    arena_size = None
+
+    def __init__(self, name, count):
+        '''This initializer takes the scenario name and its entity count.'''
+        self.name = name
+        self.count = count
+
+    def setup(self, simulation):
+        pass
+
+    def tick(self, simulation, frame):
+        return None, 0
+
+    def report(self, simulation):
+        return {}
+
+class ZombiesAdvancing(Scenario):
+    '''count zombies walk up the screen, out of the player's column, for
+    fewer frames than it takes them to reach the wall.'''
+    def setup(self, simulation):
+        player = simulation.player.rect
+        columns = [x for x in range(20, 620) if x < player.left - 14 or x > player.right + 14]
+        for zombie in range(self.count):
+            simulation.add_zombie(simulation.random.choice(columns))
+
+class BulletsInFlight(Scenario):
+    '''The player fires enough bullets every frame to keep about count
+    bullets in flight.'''
+    def tick(self, simulation, frame):
+        # A bullet lives for about 12 frames before it leaves the field.
+        return None, max(1, self.count // 12)
+
+class ExplosionStorm(Scenario):
+    '''count explosions start every frame, as in a chain of mass kills.'''
+    def tick(self, simulation, frame):
+        for explosion in range(self.count):
+            simulation.add_explosion(simulation.random.randrange(20, 620),
+                                     simulation.random.randrange(30, 450))
+        return None, 0
+
+class HudChurn(Scenario):
+    '''The wave counter changes every frame, so the HUD is redrawn each time.'''
+    def tick(self, simulation, frame):
+        simulation.wave_level.wave_increase()
+        return None, 0
+
+class RandomPlay(Scenario):
+    '''A whole seeded game played by the random input policy.'''
+    frames = 3000
+
+    def setup(self, simulation):
+        self.policy = pyBoxheadSim.random_policy(self.count)
+
+    def tick(self, simulation, frame):
+        return self.policy(None)
+
+class ArenaScroll(Scenario):
+    '''The player walks diagonally across an arena count screens wide and
+    high, so the camera keeps scrolling onto background chunks it has not
+    shown yet. Reports how many chunks were built ahead of the camera and
+    how many only when they came in view.'''
+    frames = 900
+
+    def __init__(self, name, count):
+        Scenario.__init__(self, name, count)
+        self.arena_size = (pyBoxheadSim.SCREEN_SIZE[0] * count, pyBoxheadSim.SCREEN_SIZE[1] * count)
+
+    def tick(self, simulation, frame):
+        # Right and down (the hat's y is up).
+        return (1, -1), 0
+
+    def report(self, simulation):
+        background = simulation.arena.background()
+        return {"chunks_built": background.built, "chunks_missed": background.missed}
+
+# The default scenarios and loads.
+SCENARIOS = (ZombiesAdvancing("zombies_100", 100),
+             ZombiesAdvancing("zombies_1000", 1000),
+             BulletsInFlight("bullets_200", 200),
+             ExplosionStorm("explosions_20", 20),
+             HudChurn("hud_churn", 1),
+             RandomPlay("random_play", 1),
+             ArenaScroll("arena_scroll", 10))
+
+def percentile(values, fraction):
+    '''This function returns the value at fraction (0 to 1) of the sorted values.'''
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def play(scenario, screen, background, seed, backend, timer=None, pathing="straight"):
+    '''This function plays a scenario once. It returns the duration of every
+    frame in seconds (when a timer is given), the number of entities live
+    in each frame and the scenario's own results.'''
+    arena = None
+    if scenario.arena_size:
+        arena = pyBoxheadArena.Arena(scenario.arena_size)
+    simulation = pyBoxheadSim.Simulation(screen, seed, backend, arena=arena, pathing=pathing)
+    simulation.allSprites.clear(screen, background)
+    screen.blit(background, (0, 0))
+    scenario.setup(simulation)
+    durations = []
+    entities = []
+    for frame in range(scenario.frames):
+        if simulation.finished:
+            break
+        hat, shots = scenario.tick(simulation, frame)
+        start = timer() if timer else 0
+        simulation.step(hat, shots)
+        pygame.display.update(simulation.draw(screen))
+        if timer:
+            durations.append(timer() - start)
+        entities.append(simulation.zombie_count() + simulation.bullet_count() +
+                        len(simulation.explosions))
+    return durations, entities, scenario.report(simulation)
+
+def run_scenario(scenario, screen, background, seed=1, backend="sprites", pathing="straight"):
+    '''This function times a scenario, then plays it again under tracemalloc
+    to measure allocations, and returns a dictionary of results.'''
+    gc.collect()
+    collections = gc_collections()
+    durations, entities, report = play(scenario, screen, background, seed, backend, timeit.default_timer, pathing)
+    collections = gc_collections() - collections
+    total = sum(durations)
+    result = {"frames": len(durations),
+              "total_s": total,
+              "mean_ms": total / len(durations) * 1000,
+              "p50_ms": percentile(durations, 0.50) * 1000,
+              "p95_ms": percentile(durations, 0.95) * 1000,
+              "p99_ms": percentile(durations, 0.99) * 1000,
+              "max_ms": max(durations) * 1000,
+              "peak_entities": max(entities),
+              "entities_per_s": sum(entities) / total if total else 0.0,
+              "gc_collections": collections}
+    result.update(report)
+    if tracemalloc is not None:
+        tracemalloc.start()
+        play(scenario, screen, background, seed, backend, pathing=pathing)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["alloc_peak_kb"] = peak / 1024.0
+        result["alloc_retained_kb"] = current / 1024.0
+    return result
+
+def instance_bytes(sprite):
+    '''This function returns the bytes one sprite takes: the object, its
+    attribute dictionary and its rect, but not the image it shares.'''
+    size = sys.getsizeof(sprite) + sys.getsizeof(sprite.rect)
+    if hasattr(sprite, "__dict__"):
+        size += sys.getsizeof(sprite.__dict__)
+    return size
+
+def sprite_bytes(screen, seed=1):
+    '''This function returns the bytes of one pooled bullet and one pooled
+    zombie of a fresh Simulation.'''
+    simulation = pyBoxheadSim.Simulation(screen, seed)
+    bullet = simulation.bulletPool.acquire(100, 100)
+    zombie = simulation.zombiePool.acquire(100)
+    return {"bullet": instance_bytes(bullet), "zombie": instance_bytes(zombie)}
+
+def gc_collections():
+    '''This function returns the number of garbage collections run so far.'''
+    if hasattr(gc, "get_stats"):
+        return sum([generation["collections"] for generation in gc.get_stats()])
+    return 0
+
+def compare(results, baseline, threshold):
+    '''This function compares the p95 frame time of every scenario with a
+    baseline run, prints the change, and returns the names of the scenarios
+    that got slower by more than threshold (e.g. 0.1 for 10%).'''
+    regressions = []
+    for name, result in sorted(results["scenarios"].items()):
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            continue
+        change = result["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print("%-16s p95 %8.3f ms -> %8.3f ms  (%+.1f%%)%s" % (
+            name, old["p95_ms"], result["p95_ms"], change * 100, flag))
+    return regressions
+
+def main():
+    '''This function runs the benchmarks from the command line.'''
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark pyBoxhead headless.")
+    parser.add_argument("--output", help="save the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare with the results saved in this file")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="p95 slowdown that counts as a regression (default 0.10)")
+    parser.add_argument("--backend", choices=("sprites", "numpy"), default="sprites")
+    parser.add_argument("--pathing", choices=("straight", "flow"), default="straight",
+                        help="how zombies find their way (see pyBoxheadFlow)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", action="append", help="run only this scenario (repeatable)")
+    args = parser.parse_args()
+
+    screen = pyBoxheadSim.headless_screen()
+    background = assets.image("boxheadbg.png")
+    results = {"meta": {"python": platform.python_version(),
+                        "pygame": pygame.version.ver,
+                        "platform": platform.platform(),
+                        "backend": args.backend,
+                        "pathing": args.pathing,
+                        "seed": args.seed},
+               "sprite_bytes": sprite_bytes(screen, args.seed),
+               "scenarios": {}}
+    print("bytes per sprite: bullet %(bullet)d, zombie %(zombie)d" % results["sprite_bytes"])
+    for scenario in SCENARIOS:
+        if args.only and scenario.name not in args.only:
+            continue
+        result = run_scenario(scenario, screen, background, args.seed, args.backend, args.pathing)
+        results["scenarios"][scenario.name] = result
+        print("%-16s p50 %7.3f  p95 %7.3f  p99 %7.3f ms  %9.0f entities/s  peak %5d" % (
+            scenario.name, result["p50_ms"], result["p95_ms"], result["p99_ms"],
+            result["entities_per_s"], result["peak_entities"]))
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Packed asset bundle for pyBoxhead.
+
+    A bundle is one file holding every game asset already decoded: images as
+    raw RGBA pixels, sounds as PCM in the mixer's format, and the font file.
+    It is memory mapped when read, so a cold start does not decode any PNG
+    or WAV file. Sounds are only used if the mixer runs in the same format
+    the bundle was built with; otherwise they are loaded from their files.
+
+    Layout: the 8 byte magic, a 4 byte little-endian header length, a JSON
+    header listing every entry, then the entry data, each aligned to 16 bytes.
+
+    Usage:
+        python pyBoxheadBundle.py [bundle file]
+'''
+import json, mmap, os, struct, sys, pygame
+from pyBoxheadAssets import ASSET_DIR, GAME_ASSETS
+
+MAGIC = b"PBXBNDL1"
+ALIGN = 16
+DEFAULT_BUNDLE = os.path.join(ASSET_DIR, "pyBoxhead.bundle")
+
+# pygame 2 renamed image.tostring to image.tobytes.
+image_to_bytes = getattr(pygame.image, "tobytes", pygame.image.tostring)
+
+def build_bundle(filename=DEFAULT_BUNDLE, manifest=GAME_ASSETS, asset_dir=ASSET_DIR):
+    '''This function decodes every asset of the manifest and writes them to
+    a bundle file. The mixer must be initialized to decode the sounds.'''
+    entries = []
+    blobs = []
+    fonts = set()
+    for item in manifest:
+        kind, name = item[0], item[1]
+        path = os.path.join(asset_dir, name)
+        if kind == "image":
+            surface = pygame.image.load(path)
+            blobs.append(image_to_bytes(surface, "RGBA"))
+            entries.append({"kind": kind, "name": name, "size": list(surface.get_size())})
+        elif kind == "sound":
+            blobs.append(pygame.mixer.Sound(path).get_raw())
+            entries.append({"kind": kind, "name": name})
+        elif kind == "font" and name not in fonts:
+            # One copy of the font file serves every size.
+            fonts.add(name)
+            with open(path, "rb") as font_file:
+                blobs.append(font_file.read())
+            entries.append({"kind": kind, "name": name})
+
+    # The header holds the offsets, and the offsets start after the header,
+    # so the header is written again with the offsets it gives until they
+    # stop changing. Longer offsets only ever make the header longer, so
+    # this ends.
+    header = {"mixer": pygame.mixer.get_init(), "entries": entries}
+    start = None
+    while True:
+        encoded = json.dumps(header).encode("utf-8")
+        first = aligned(len(MAGIC) + 4 + len(encoded))
+        if first == start:
+            break
+        start = offset = first
+        for entry, blob in zip(entries, blobs):
+            entry["offset"] = offset
+            entry["length"] = len(blob)
+            offset = aligned(offset + len(blob))
+
+    with open(filename, "wb") as bundle:
+        bundle.write(MAGIC)
+        bundle.write(struct.pack("<I", len(encoded)))
+        bundle.write(encoded)
+        for entry, blob in zip(entries, blobs):
+            assert bundle.tell() <= entry["offset"], "bundle entry %s overlaps the one before" % entry["name"]
+            bundle.write(b"\0" * (entry["offset"] - bundle.tell()))
+            bundle.write(blob)
+    return filename
+
+def aligned(offset):
+    '''This function rounds an offset up to the bundle alignment.'''
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+def read_bundle(filename):
+    '''This function memory maps a bundle and returns a dictionary from asset
+    name to an unconverted Surface, a Sound, or the raw font file bytes. It
+    returns None if the file is not a bundle this version can read.'''
+    with open(filename, "rb") as bundle:
+        if bundle.read(len(MAGIC)) != MAGIC:
+            return None
+        # ACCESS_COPY gives pages surfaces can wrap without copying, while
+        # the file itself is never written.
+        data = mmap.mmap(bundle.fileno(), 0, access=mmap.ACCESS_COPY)
+    length = struct.unpack("<I", data[len(MAGIC):len(MAGIC) + 4])[0]
+    header = json.loads(data[len(MAGIC) + 4:len(MAGIC) + 4 + length].decode("utf-8"))
+    view = memoryview(data)
+    mixer = pygame.mixer.get_init()
+    same_mixer = mixer is not None and list(mixer) == list(header["mixer"] or ())
+    assets = {}
+    for entry in header["entries"]:
+        kind, name = entry["kind"], entry["name"]
+        blob = view[entry["offset"]:entry["offset"] + entry["length"]]
+        if kind == "image":
+            assets[name] = pygame.image.frombuffer(blob, tuple(entry["size"]), "RGBA")
+        elif kind == "sound" and same_mixer:
+            assets[name] = pygame.mixer.Sound(buffer=blob)
+        elif kind == "font":
+            assets[name] = blob.tobytes()
+    return assets
+
+if __name__ == "__main__":
+    pygame.mixer.init()
+    pygame.font.init()
+    print("wrote %s" % build_bundle(*sys.argv[1:2]))
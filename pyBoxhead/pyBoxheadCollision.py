@@ -0,0 +1,73 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Collision broadphase for pyBoxhead.
+
+    Sprites are sorted into a uniform grid of square cells, so a collision
+    check only looks at the sprites that share a cell with the rect being
+    tested, instead of every sprite in the group.
+
+'''
+
+class SpatialHash(object):
+    '''This class defines a uniform grid of cells holding sprites by their rect.'''
+    def __init__(self, cell_size=64):
+        '''This initializer takes the width and height of a grid cell in pixels.'''
+        self.__cell_size = cell_size
+        self.__cells = {}
+        # Insertion order of every sprite, so queries return sprites in the
+        # same order as iterating the group they came from.
+        self.__order = {}
+        self.__count = 0
+
+    def __len__(self):
+        return len(self.__order)
+
+    def __cell_range(self, rect):
+        '''This method returns the range of cell columns and rows a rect covers.'''
+        size = self.__cell_size
+        columns = range(rect.left // size, (rect.right - 1) // size + 1)
+        rows = range(rect.top // size, (rect.bottom - 1) // size + 1)
+        return columns, rows
+
+    def clear(self):
+        '''This method removes every sprite from the grid.'''
+        self.__cells.clear()
+        self.__order.clear()
+        self.__count = 0
+
+    def insert(self, sprite):
+        '''This method adds a sprite to every cell its rect touches.'''
+        self.__order[sprite] = self.__count
+        self.__count += 1
+        columns, rows = self.__cell_range(sprite.rect)
+        for column in columns:
+            for row in rows:
+                self.__cells.setdefault((column, row), []).append(sprite)
+
+    def rebuild(self, sprites):
+        '''This method empties the grid and inserts sprites in iteration order.
+        It is called once per frame, after the sprites have moved.'''
+        self.clear()
+        for sprite in sprites:
+            self.insert(sprite)
+
+    def remove(self, sprite):
+        '''This method takes a sprite out of the grid, e.g. once it is killed.
+        Stale cell entries are skipped by query().'''
+        self.__order.pop(sprite, None)
+
+    def query(self, rect):
+        '''This method returns the sprites whose rects collide with rect, in
+        the order they were inserted. This matches spritecollide() on the
+        group the grid was built from.'''
+        order = self.__order
+        found = {}
+        columns, rows = self.__cell_range(rect)
+        for column in columns:
+            for row in rows:
+                for sprite in self.__cells.get((column, row), ()):
+                    if sprite in order and sprite not in found and rect.colliderect(sprite.rect):
+                        found[sprite] = order[sprite]
+        return sorted(found, key=found.get)
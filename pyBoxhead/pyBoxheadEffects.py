@@ -0,0 +1,101 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Explosion effects for pyBoxhead.
+
+    Explosions are not sprites. Every explosion is only its centre and the
+    tick it started on; its animation frame follows from the current tick.
+    The 16 frames are packed side by side into one sprite sheet, and every
+    explosion on screen is drawn from it with one Surface.blits call.
+
+'''
+import collections, pygame
+from pyBoxheadAssets import assets
+
+def sprite_sheet(frames):
+    '''This function packs same-sized frames side by side into one surface,
+    and returns it with the area of every frame on it.'''
+    width, height = frames[0].get_size()
+    sheet = pygame.Surface((width * len(frames), height), pygame.SRCALPHA)
+    areas = []
+    for number, frame in enumerate(frames):
+        area = pygame.Rect(number * width, 0, width, height)
+        sheet.blit(frame, area)
+        areas.append(area)
+    if pygame.display.get_surface() is not None:
+        sheet = sheet.convert_alpha()
+    return sheet, areas
+
+class ExplosionEffects(object):
+    '''This class runs every explosion of a game. At most limit explosions
+    play at once; a new one past the limit replaces the oldest.'''
+    def __init__(self, limit=64):
+        '''This initializer takes the most explosions that may play at once.'''
+        self.sheet, self.areas = sprite_sheet(assets.frames("explosions", "explosion", 16))
+        self.frames = len(self.areas)
+        self.limit = limit
+        # 2 plays every other frame, so explosions end in half the time and
+        # fewer are on screen at once, e.g. when the game is over budget.
+        self.frame_step = 1
+        width, height = self.areas[0].size
+        # Offset from an explosion's centre to the top left of its frame.
+        self.__offset = (-(width // 2), -(height // 2))
+        # (x, y, start tick) of every explosion, oldest first. Every
+        # explosion lasts as long, so they also end oldest first.
+        self.__active = collections.deque()
+        # Screen areas drawn last frame, to be cleared this frame.
+        self.__drawn = []
+        self.dropped = 0
+
+    def __len__(self):
+        '''This method returns the number of explosions playing.'''
+        return len(self.__active)
+
+    def add(self, x, y, tick):
+        '''This method starts an explosion centred on (x, y) at tick.'''
+        if len(self.__active) >= self.limit:
+            self.__active.popleft()
+            self.dropped += 1
+        self.__active.append((x, y, tick))
+
+    def update(self, tick):
+        '''This method ends the explosions that have shown their last frame
+        by tick.'''
+        active = self.__active
+        last = tick - self.frames // self.frame_step
+        while active and active[0][2] <= last:
+            active.popleft()
+
+    def active(self):
+        '''This method returns the (x, y, start tick) of every explosion
+        playing, oldest first.'''
+        return list(self.__active)
+
+    def clear(self):
+        '''This method ends every explosion.'''
+        self.__active.clear()
+
+    def drawn(self):
+        '''This method returns the screen areas drawn last frame, which must
+        be cleared before drawing again.'''
+        return self.__drawn
+
+    def sequence(self, tick):
+        '''This method returns the (sheet, topleft, frame area) of every
+        explosion at its frame for tick. Explosions starting after tick (a
+        network client drawing the past) or already over at tick are left
+        out.'''
+        sheet = self.sheet
+        areas = self.areas
+        dx, dy = self.__offset
+        step = self.frame_step
+        frames = self.frames
+        return [(sheet, (x + dx, y + dy), areas[(tick - start) * step])
+                for x, y, start in self.__active if 0 <= (tick - start) * step < frames]
+
+    def draw(self, surface, tick):
+        '''This method draws every explosion at its frame for tick, in one
+        Surface.blits call, and returns the areas drawn.'''
+        self.__drawn = surface.blits(self.sequence(tick))
+        return self.__drawn
@@ -0,0 +1,200 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Flow field pathfinding for pyBoxhead zombies.
+
+    The playing field is cut into square cells. Every cell holds the
+    direction a zombie in it should walk: toward the barricade (the
+    EndZone along the top), or toward the nearest player when a player is
+    closer than the barricade and within chase_radius cells.
+
+    The directions to the barricade never change and are worked out once.
+    The directions to the players are worked out again only when a player
+    moves to another cell, by a breadth first search from the players'
+    cells that stops at chase_radius cells, so it costs the same however
+    large the field is. Zombies then look up their cell's direction, one
+    list index each, however many zombies there are.
+
+    Zombies in the same cell push away from the middle of their crowd, and
+    away from crowded neighbouring cells, so the horde does not collapse
+    into a single file.
+
+'''
+import math
+
+# Neighbouring cells, straight ones first so they win ties.
+NEIGHBOURS = ((0, -1), (-1, 0), (1, 0), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1))
+
+def unit(dx, dy):
+    '''This function returns (dx, dy) scaled to length 1, or (0, 0).'''
+    length = math.hypot(dx, dy)
+    if not length:
+        return 0.0, 0.0
+    return dx / length, dy / length
+
+class FlowField(object):
+    '''This class keeps the direction zombies walk in, cell by cell.'''
+    def __init__(self, size, cell_size=32, chase_radius=12, blocked=(), separation=0.6):
+        '''This initializer takes the (width, height) of the playing field,
+        the cell size in pixels, how many cells away from a player zombies
+        start chasing it, the (column, row) of every cell zombies cannot
+        walk through, and how hard zombies push away from each other, in
+        pixels per tick.'''
+        self.cell_size = cell_size
+        self.columns = max(1, (size[0] + cell_size - 1) // cell_size)
+        self.rows = max(1, (size[1] + cell_size - 1) // cell_size)
+        self.chase_radius = chase_radius
+        self.separation = separation
+        self.__blocked = set([column + row * self.columns for column, row in blocked])
+        # Cells along the top of the field are the barricade.
+        wall_distance = self.__search([column for column in range(self.columns)
+                                       if column not in self.__blocked])
+        self.__wall_direction = [self.__downhill(cell, wall_distance, (0.0, -1.0))
+                                 for cell in range(self.columns * self.rows)]
+        # The same distances as a list, cells cut off as far as can be.
+        far = self.columns * self.rows
+        self.__wall_distance = [wall_distance.get(cell, far) for cell in range(far)]
+        # The direction of every cell right now; None in a player's cell,
+        # where zombies head straight for the player.
+        self.__direction = list(self.__wall_direction)
+        self.__player_cells = ()
+        self.__chased = []
+        self.recomputes = 0
+        self.chased_cells = 0
+
+    def cell(self, x, y):
+        '''This method returns the index of the cell holding the point
+        (x, y), the nearest one for a point outside the field.'''
+        size = self.cell_size
+        column = min(max(int(x) // size, 0), self.columns - 1)
+        row = min(max(int(y) // size, 0), self.rows - 1)
+        return column + row * self.columns
+
+    def __search(self, sources, limit=None, bound=None):
+        '''This method returns the distance in cells from the nearest source
+        cell to every cell reached, as a dictionary, by a breadth first
+        search over the eight neighbours. The search stops limit cells out,
+        and at cells no nearer than bound says.'''
+        columns, rows = self.columns, self.rows
+        blocked = self.__blocked
+        distance = dict([(cell, 0) for cell in sources])
+        frontier = list(distance)
+        steps = 0
+        while frontier and (limit is None or steps < limit):
+            steps += 1
+            reached = []
+            for cell in frontier:
+                column, row = cell % columns, cell // columns
+                for dx, dy in NEIGHBOURS:
+                    x, y = column + dx, row + dy
+                    if 0 <= x < columns and 0 <= y < rows:
+                        neighbour = x + y * columns
+                        if neighbour in distance or neighbour in blocked:
+                            continue
+                        if bound is not None and bound[neighbour] <= steps:
+                            continue
+                        distance[neighbour] = steps
+                        reached.append(neighbour)
+            frontier = reached
+        return distance
+
+    def __downhill(self, cell, distance, goal=None):
+        '''This method returns the unit direction from a cell to its
+        neighbour nearest a goal, or goal for a goal cell.'''
+        here = distance.get(cell)
+        if here == 0:
+            return goal
+        columns, rows = self.columns, self.rows
+        column, row = cell % columns, cell // columns
+        best = here
+        direction = (0.0, 0.0)
+        for dx, dy in NEIGHBOURS:
+            x, y = column + dx, row + dy
+            if 0 <= x < columns and 0 <= y < rows:
+                there = distance.get(x + y * columns)
+                if there is not None and (best is None or there < best):
+                    best = there
+                    direction = unit(dx, dy)
+        return direction
+
+    def track(self, points):
+        '''This method takes the centres of the live players, and works out
+        the directions toward them again if any moved to another cell.'''
+        cells = tuple(sorted(set([self.cell(x, y) for x, y in points])))
+        if cells == self.__player_cells:
+            return
+        self.__player_cells = cells
+        self.recomputes += 1
+        # Cells chased before go back to walking to the barricade.
+        direction = self.__direction
+        wall_direction = self.__wall_direction
+        for cell in self.__chased:
+            direction[cell] = wall_direction[cell]
+        # Only cells nearer a player than the barricade chase the player.
+        distance = self.__search(cells, self.chase_radius, self.__wall_distance)
+        self.__chased = list(distance)
+        self.chased_cells = len(distance)
+        for cell in distance:
+            direction[cell] = self.__downhill(cell, distance)
+
+    def direction(self, x, y):
+        '''This method returns the unit direction to walk from (x, y), or
+        None in a player's cell.'''
+        return self.__direction[self.cell(x, y)]
+
+    def moves(self, positions, speed, targets=()):
+        '''This method returns the (dx, dy) every zombie at positions moves
+        in one tick at speed pixels per tick: along its cell's direction (or
+        at the nearest target in a player's cell), pushed away from the
+        middle of its cell's crowd and from a more crowded cell beside it.'''
+        size = self.cell_size
+        columns = self.columns
+        last_column = columns - 1
+        last_row = self.rows - 1
+        directions = self.__direction
+        separation = self.separation
+        # First every zombie's cell, and the count and sum of positions of
+        # every cell holding zombies.
+        cells = []
+        crowds = {}
+        for x, y in positions:
+            column = int(x) // size
+            row = int(y) // size
+            column = 0 if column < 0 else last_column if column > last_column else column
+            row = 0 if row < 0 else last_row if row > last_row else row
+            cell = column + row * columns
+            cells.append(cell)
+            crowd = crowds.get(cell)
+            if crowd is None:
+                crowds[cell] = [1, x, y]
+            else:
+                crowd[0] += 1
+                crowd[1] += x
+                crowd[2] += y
+        moves = []
+        for (x, y), cell in zip(positions, cells):
+            direction = directions[cell]
+            if direction is None:
+                direction = (0.0, 0.0)
+                if targets:
+                    target_x, target_y = min(targets, key=lambda point: (point[0] - x) ** 2 + (point[1] - y) ** 2)
+                    direction = unit(target_x - x, target_y - y)
+            dx = direction[0] * speed
+            dy = direction[1] * speed
+            if separation:
+                count, sum_x, sum_y = crowds[cell]
+                if count > 1:
+                    push_x, push_y = unit(x - sum_x / count, y - sum_y / count)
+                    dx += push_x * separation
+                    dy += push_y * separation
+                column = cell % columns
+                left = crowds.get(cell - 1) if column > 0 else None
+                right = crowds.get(cell + 1) if column < last_column else None
+                side = (left[0] if left else 0) - (right[0] if right else 0)
+                if side > 0:
+                    dx += separation * 0.5
+                elif side < 0:
+                    dx -= separation * 0.5
+            moves.append((dx, dy))
+        return moves
@@ -0,0 +1,152 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: NumPy entity backend for pyBoxhead.
+
+    Instead of one Sprite object per zombie and bullet, the horde keeps the
+    centre position of every live zombie and bullet in NumPy arrays.
+    Movement, the edge-of-screen checks and rect collisions each run as one
+    array operation per tick, and drawing is one Surface.blits call, so
+    tens of thousands of zombies fit in a frame.
+
+    NumPy is optional; the regular sprite backend does not need it.
+
+'''
+from pyBoxheadAssets import assets
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class EntityArrays(object):
+    '''This class keeps the centre x and y of many same-sized entities in
+    integer arrays, in the order they were added.'''
+    def __init__(self, image):
+        '''This initializer takes the shared image every entity is drawn with.'''
+        self.image = image
+        self.width, self.height = image.get_size()
+        self.centerx = numpy.zeros(0, numpy.int32)
+        self.centery = numpy.zeros(0, numpy.int32)
+
+    def __len__(self):
+        return len(self.centerx)
+
+    def add(self, xs, ys):
+        '''This method appends entities centred at the given coordinates.'''
+        self.centerx = numpy.append(self.centerx, numpy.asarray(xs, numpy.int32))
+        self.centery = numpy.append(self.centery, numpy.asarray(ys, numpy.int32))
+
+    def keep(self, alive):
+        '''This method removes every entity whose alive flag is False.'''
+        self.centerx = self.centerx[alive]
+        self.centery = self.centery[alive]
+
+    def bounds(self):
+        '''This method returns the left, top, right and bottom arrays, the
+        same way pygame.Rect derives them from a centre point.'''
+        left = self.centerx - self.width // 2
+        top = self.centery - self.height // 2
+        return left, top, left + self.width, top + self.height
+
+    def overlaps(self, rect):
+        '''This method returns a mask of the entities whose rects collide with
+        rect, following pygame.Rect.colliderect.'''
+        left, top, right, bottom = self.bounds()
+        if rect.width <= 0 or rect.height <= 0:
+            return numpy.zeros(len(self), bool)
+        return (left < rect.right) & (rect.left < right) & (top < rect.bottom) & (rect.top < bottom)
+
+    def sequence(self):
+        '''This method returns the (image, topleft) pair of every entity.'''
+        left, top = self.bounds()[:2]
+        image = self.image
+        return [(image, position) for position in zip(left.tolist(), top.tolist())]
+
+    def draw(self, surface):
+        '''This method draws every entity with a single Surface.blits call.'''
+        surface.blits(self.sequence(), False)
+
+class Horde(object):
+    '''This class replaces the zombie and bullet sprite groups with arrays.
+    It follows the same rules as the Zombie and Bullet sprites.'''
+    def __init__(self, screen):
+        '''This initializer takes the screen surface the horde is placed on.'''
+        if numpy is None:
+            raise ImportError("the numpy entity backend needs NumPy installed")
+        self.__screen = screen
+        self.zombies = EntityArrays(assets.image("zombie.png"))
+        self.bullets = EntityArrays(assets.image("bullet.png"))
+
+    def spawn_zombies(self, xs):
+        '''This method adds zombies at the given x positions, standing on the
+        bottom edge of the playing field like Zombie sprites.'''
+        xs = numpy.asarray(xs, numpy.int32).reshape(-1)
+        bottom = self.__screen.get_height() - 102
+        top = bottom - self.zombies.height
+        ys = numpy.full(len(xs), top + self.zombies.height // 2, numpy.int32)
+        self.zombies.add(xs, ys)
+
+    def fire(self, player_x, player_y):
+        '''This method adds a bullet centred at the given coordinates.'''
+        self.bullets.add((player_x,), (player_y,))
+
+    def move(self):
+        '''This method moves every zombie and bullet one tick.'''
+        # Zombies move up by 1.25 pixels, rounded like a Rect coordinate,
+        # and stop once they reach the top wall.
+        zombies = self.zombies
+        top = zombies.centery - zombies.height // 2
+        moving = top >= 30
+        moved = numpy.round(zombies.centery - 1.25).astype(numpy.int32)
+        zombies.centery = numpy.where(moving, moved, 30 + zombies.height // 2)
+
+        # Bullets past the bottom of the playing field are killed, the rest
+        # keep moving down.
+        bullets = self.bullets
+        bottom = bullets.centery - bullets.height // 2 + bullets.height
+        bullets.keep(bottom <= self.__screen.get_height() - 110)
+        bullets.centery += 18
+
+    def collide_bullets(self):
+        '''This method kills every zombie touched by a bullet, and every bullet
+        that touched a zombie. Each zombie goes to the first bullet that
+        touches it, as when the bullets are checked one at a time. It returns
+        the bullet centre of every hit, in the order the hits happen.'''
+        zombies = self.zombies
+        bullets = self.bullets
+        if len(zombies) == 0 or len(bullets) == 0:
+            return []
+        z_left, z_top, z_right, z_bottom = zombies.bounds()
+        b_left, b_top, b_right, b_bottom = bullets.bounds()
+        hits = ((b_left[:, None] < z_right) & (z_left < b_right[:, None]) &
+                (b_top[:, None] < z_bottom) & (z_top < b_bottom[:, None]))
+        hit_zombies = hits.any(axis=0)
+        if not hit_zombies.any():
+            return []
+        # The first bullet that touches each zombie.
+        shooter = hits.argmax(axis=0)[hit_zombies]
+        zombie_index = numpy.nonzero(hit_zombies)[0]
+        # Hits are reported bullet by bullet, then zombie by zombie.
+        order = numpy.lexsort((zombie_index, shooter))
+        shooter = shooter[order]
+        positions = list(zip(bullets.centerx[shooter].tolist(), bullets.centery[shooter].tolist()))
+        zombies.keep(~hit_zombies)
+        bullet_alive = numpy.ones(len(bullets), bool)
+        bullet_alive[shooter] = False
+        bullets.keep(bullet_alive)
+        return positions
+
+    def collide_rect(self, rect):
+        '''This method kills every zombie touching rect, and returns the
+        centres of the killed zombies.'''
+        hit = self.zombies.overlaps(rect)
+        positions = list(zip(self.zombies.centerx[hit].tolist(), self.zombies.centery[hit].tolist()))
+        if positions:
+            self.zombies.keep(~hit)
+        return positions
+
+    def draw(self, surface):
+        '''This method draws the zombies, then the bullets on top of them.'''
+        self.zombies.draw(surface)
+        self.bullets.draw(surface)
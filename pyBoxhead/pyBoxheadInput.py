@@ -0,0 +1,158 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Joystick input layer for pyBoxhead.
+
+    Only the event types the game handles are let into the event queue, so
+    it never backs up with mouse motion or window events. Joystick input is
+    read from the queue again right before every simulation step, instead of
+    once at the top of the frame. Every button press queued since the step
+    before is a shot, so a quick press and release between two steps is not
+    lost, and when one frame runs several steps each only gets the presses
+    queued before it. Hat events are coalesced: a step only sees the last
+    hat position since the step before, and not at all if the hat is where
+    it already was. The joysticks are polled only to tell which buttons are
+    held down.
+
+    Every hat change and button press is timed from when its event arrives
+    until the display update that shows its effect, so the time it waited
+    in the queue is counted. pygame events carry no timestamp, so an event
+    arrives when the game first reads it off the queue, at the top of the
+    frame or right before a step.
+
+'''
+import collections, timeit, pygame
+
+# Event types the game handles. Every other type is blocked.
+GAME_EVENTS = (pygame.QUIT, pygame.KEYDOWN, pygame.JOYHATMOTION, pygame.JOYBUTTONDOWN)
+JOYSTICK_EVENTS = (pygame.JOYHATMOTION, pygame.JOYBUTTONDOWN)
+
+class InputLayer(object):
+    '''This class reads joystick input for the simulation and measures the
+    time from input to display.'''
+    def __init__(self, joysticks=(), log=None, history=1000, timer=timeit.default_timer):
+        '''This initializer takes the joysticks to read, an optional CSV
+        file name to log every latency to, the number of recent latencies
+        the statistics are taken over, and the timer function in seconds.'''
+        self.__timer = timer
+        self.__joysticks = list(joysticks)
+        # Buttons held down at the last step, by joystick.
+        self.__held = [[] for stick in self.__joysticks]
+        # Input read but not yet given to a step.
+        self.__hat = None
+        self.__shots = 0
+        # When the first hat event since the last step arrived.
+        self.__hat_read = None
+        # Hat position last given to a step.
+        self.__last_hat = None
+        # (kind, arrival time) of button presses not yet given to a step, and
+        # of input given to a step but not yet shown.
+        self.__read = []
+        self.__waiting = []
+        self.__latencies = {"hat": collections.deque(maxlen=history),
+                            "button": collections.deque(maxlen=history)}
+        self.__counts = {"hat": 0, "button": 0}
+        self.coalesced = 0
+        self.__log = None
+        if log:
+            self.__log = open(log, "w")
+            self.__log.write("kind,read_s,shown_s,latency_ms\n")
+
+    def allow(self):
+        '''This method blocks every event type the game does not handle.'''
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(list(GAME_EVENTS))
+
+    def poll(self):
+        '''This method reads the event queue, keeps the joystick input for
+        the next step, and returns the other events.'''
+        others = []
+        joystick = []
+        for event in pygame.event.get():
+            if event.type in JOYSTICK_EVENTS:
+                joystick.append(event)
+            else:
+                others.append(event)
+        self.__add(joystick)
+        return others
+
+    def __add(self, events):
+        '''This method adds joystick events to the input of the next step.'''
+        now = self.__timer()
+        for event in events:
+            if event.type == pygame.JOYHATMOTION:
+                if self.__hat is None:
+                    self.__hat_read = now
+                else:
+                    self.coalesced += 1
+                self.__hat = event.value
+            else:
+                self.__shots += 1
+                self.__read.append(("button", now))
+
+    def take(self):
+        '''This method reads the joystick events that came in since the last
+        poll, and returns the (hat, shots) input for the step about to run:
+        the new hat position or None, and one shot for every button press
+        since the last step. Other events are left in the queue for the next
+        poll().'''
+        self.__add(pygame.event.get(JOYSTICK_EVENTS))
+        # Getting the events has pumped the queue, so the polled state is
+        # as new as the events.
+        self.__held = [[button for button in range(stick.get_numbuttons()) if stick.get_button(button)]
+                       for stick in self.__joysticks]
+        hat, shots = self.__hat, self.__shots
+        self.__hat = None
+        self.__shots = 0
+        self.__waiting.extend(self.__read)
+        self.__read = []
+        if hat is not None:
+            if hat == self.__last_hat:
+                # The hat is already there; the step has nothing to change.
+                self.coalesced += 1
+                hat = None
+            else:
+                self.__last_hat = hat
+                self.__waiting.append(("hat", self.__hat_read))
+        return hat, shots
+
+    def held(self):
+        '''This method returns, for every joystick, the buttons held down
+        when the last step's input was taken.'''
+        return [list(buttons) for buttons in self.__held]
+
+    def shown(self):
+        '''This method is called right after the display is updated, to time
+        the input the steps of this frame have used.'''
+        if not self.__waiting:
+            return
+        now = self.__timer()
+        for kind, read in self.__waiting:
+            latency = (now - read) * 1000
+            self.__latencies[kind].append(latency)
+            self.__counts[kind] += 1
+            if self.__log:
+                self.__log.write("%s,%.6f,%.6f,%.3f\n" % (kind, read, now, latency))
+        self.__waiting = []
+
+    def stats(self):
+        '''This method returns, for hat changes and button presses, how many
+        were shown, and the mean, 95th percentile and worst latency in
+        milliseconds over the recent history.'''
+        result = {"coalesced": self.coalesced}
+        for kind, latencies in self.__latencies.items():
+            ordered = sorted(latencies)
+            entry = {"count": self.__counts[kind], "mean": 0.0, "p95": 0.0, "max": 0.0}
+            if ordered:
+                entry["mean"] = sum(ordered) / len(ordered)
+                entry["p95"] = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+                entry["max"] = ordered[-1]
+            result[kind] = entry
+        return result
+
+    def close(self):
+        '''This method closes the latency log.'''
+        if self.__log:
+            self.__log.close()
+            self.__log = None
@@ -0,0 +1,316 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Memory accounting and leak detection for pyBoxhead.
+
+    Two views of memory are kept, because neither sees everything:
+
+    The census walks the objects the garbage collector tracks and counts the
+    live instances of every sprite class, with the bytes of the surfaces
+    they hold. Surface pixels are allocated by SDL, so tracemalloc never
+    sees them. A surface shared by many sprites is only counted once.
+    Killed sprites waiting in a pyBoxheadPool.SpritePool for reuse are
+    counted apart from the live ones, so a pool that keeps growing shows
+    up instead of hiding among the live sprites.
+
+    tracemalloc snapshots, taken every interval ticks and at the start of
+    every wave, are diffed by allocation site (file and line). A site that
+    grew from every wave to the next for growth_waves waves of one game is
+    flagged.
+
+    The soak test plays games back to back, headless, and fails when the
+    memory grown since the first game (traced and surfaces), per live
+    entity, goes over a limit:
+
+        python pyBoxheadMemory.py --games 5 --limit 16384 --dump memory.txt
+
+    tracemalloc needs Python 3.4 or later; the census works anywhere.
+
+'''
+import collections, gc, inspect, sys, pygame
+import pyBoxheadSprites, pyBoxheadEffects
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+def sprite_classes():
+    '''This function returns every sprite class of pyBoxheadSprites.'''
+    return [value for name, value in sorted(vars(pyBoxheadSprites).items())
+            if inspect.isclass(value) and issubclass(value, pygame.sprite.Sprite)
+            and value.__module__ == pyBoxheadSprites.__name__]
+
+# Classes counted by the census: the sprites, and the explosions, which
+# hold one sprite sheet for every explosion.
+CENSUS_CLASSES = tuple(sprite_classes()) + (pyBoxheadEffects.ExplosionEffects,)
+
+def surface_bytes(surface):
+    '''This function returns the bytes of a surface's pixels.'''
+    return surface.get_pitch() * surface.get_height()
+
+def census(classes=CENSUS_CLASSES):
+    '''This function returns, for every class, the number of live instances,
+    the number of killed instances free in a sprite pool, the number of
+    distinct surfaces they hold (image or sheet), the bytes of those
+    surfaces, and the bytes the instances would hold with a copy of the
+    surface each.'''
+    counts = dict([(cls.__name__, {"count": 0, "free": 0, "surfaces": 0, "surface_bytes": 0, "referenced_bytes": 0})
+                   for cls in classes])
+    seen = dict([(cls.__name__, set()) for cls in classes])
+    for obj in gc.get_objects():
+        if not isinstance(obj, classes):
+            continue
+        # The most derived class counted, e.g. Zombie rather than PooledSprite.
+        name = type(obj).__name__
+        if name not in counts:
+            name = [cls.__name__ for cls in classes if isinstance(obj, cls)][-1]
+        entry = counts[name]
+        if getattr(obj, "pool", None) is not None and not obj.alive():
+            entry["free"] += 1
+        else:
+            entry["count"] += 1
+        surface = getattr(obj, "image", None) or getattr(obj, "sheet", None)
+        if isinstance(surface, pygame.Surface):
+            size = surface_bytes(surface)
+            entry["referenced_bytes"] += size
+            if id(surface) not in seen[name]:
+                seen[name].add(id(surface))
+                entry["surfaces"] += 1
+                entry["surface_bytes"] += size
+    return counts
+
+def total_surface_bytes(counts):
+    '''This function returns the bytes of every distinct surface in a
+    census.'''
+    return sum([entry["surface_bytes"] for entry in counts.values()])
+
+def live_entities(simulation):
+    '''This function returns the number of players, zombies, bullets and
+    explosions in a game.'''
+    return (len(simulation.players) + simulation.zombie_count() +
+            simulation.bullet_count() + len(simulation.explosions))
+
+class MemoryMonitor(object):
+    '''This class takes memory samples of a running game, and flags
+    allocation sites that keep growing from wave to wave.'''
+    def __init__(self, interval=900, top=10, frames=1, growth_waves=3, growth_bytes=16 * 1024, history=100):
+        '''This initializer takes the ticks between samples, the number of
+        allocation sites kept per diff, the stack frames tracemalloc keeps
+        per allocation, the number of waves a site must grow over to be
+        flagged, the least growth (in bytes) over those waves that is
+        flagged, and the number of samples kept.'''
+        if tracemalloc is None:
+            raise ImportError("the memory monitor needs tracemalloc (Python 3.4 or later)")
+        self.interval = interval
+        self.top = top
+        self.growth_waves = growth_waves
+        self.growth_bytes = growth_bytes
+        self.samples = collections.deque(maxlen=history)
+        # (game, wave, tick, traced bytes, live entities) at the start of
+        # every wave.
+        self.waves = []
+        self.game = 1
+        self.__wave = None
+        # Snapshots at the start of the last growth_waves + 1 waves of the
+        # current game.
+        self.__wave_snapshots = collections.deque(maxlen=growth_waves + 1)
+        self.__started_tracing = False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self.__started_tracing = True
+        self.__first = self.snapshot()
+        self.__last = self.__first
+        self.baseline = self.traced(self.__first)
+        self.baseline_surfaces = total_surface_bytes(census())
+
+    def new_game(self):
+        '''This method starts counting waves afresh for the next game, so
+        the waves of one game are not compared with those of another. The
+        memory grown since the monitor started is still measured from its
+        start.'''
+        self.game += 1
+        self.__wave = None
+        self.__wave_snapshots.clear()
+
+    def snapshot(self):
+        '''This method collects garbage and takes a tracemalloc snapshot,
+        leaving out the memory of tracemalloc and of this monitor.'''
+        gc.collect()
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>")))
+
+    def traced(self, snapshot):
+        '''This method returns the bytes allocated in a snapshot.'''
+        return sum([trace.size for trace in snapshot.traces])
+
+    def diff(self, new, old, top=None):
+        '''This method returns the allocation sites that grew the most from
+        one snapshot to another, as (site, bytes grown, blocks grown).'''
+        result = []
+        for stat in new.compare_to(old, "lineno")[:top or self.top]:
+            if stat.size_diff <= 0:
+                break
+            frame = stat.traceback[0]
+            result.append(("%s:%d" % (frame.filename, frame.lineno), stat.size_diff, stat.count_diff))
+        return result
+
+    def tick(self, simulation):
+        '''This method is called after every step, and takes a sample every
+        interval ticks and at the start of every wave.'''
+        wave = simulation.wave_level.get_wave()
+        if wave != self.__wave:
+            self.__wave = wave
+            self.sample(simulation, True)
+        elif simulation.tick % self.interval == 0:
+            self.sample(simulation)
+
+    def sample(self, simulation, wave_start=False):
+        '''This method takes a sample: the traced memory, the live entities,
+        the census and the sites that grew since the last sample.'''
+        snapshot = self.snapshot()
+        traced = self.traced(snapshot)
+        entities = live_entities(simulation)
+        counts = census()
+        entry = {"tick": simulation.tick,
+                 "wave": simulation.wave_level.get_wave(),
+                 "traced": traced,
+                 "surfaces": total_surface_bytes(counts),
+                 "entities": entities,
+                 "census": counts,
+                 "grown": self.diff(snapshot, self.__last)}
+        self.__last = snapshot
+        self.samples.append(entry)
+        if wave_start:
+            self.waves.append((self.game, entry["wave"], entry["tick"], traced, entities))
+            self.__wave_snapshots.append(snapshot)
+        return entry
+
+    def bytes_per_entity(self):
+        '''This method returns the memory grown since the monitor started,
+        traced and surfaces, per live entity of the last sample.'''
+        if not self.samples:
+            return 0.0
+        last = self.samples[-1]
+        grown = last["traced"] - self.baseline + last["surfaces"] - self.baseline_surfaces
+        return grown / float(max(1, last["entities"]))
+
+    def growth(self):
+        '''This method returns the allocation sites that grew from every wave
+        start to the next over the last growth_waves waves of the current
+        game, by at least growth_bytes in all, as (site, bytes grown).'''
+        snapshots = list(self.__wave_snapshots)
+        if len(snapshots) <= self.growth_waves:
+            return []
+        grown = None
+        for old, new in zip(snapshots, snapshots[1:]):
+            sites = dict([(site, size) for site, size, count in self.diff(new, old, top=100)])
+            if grown is None:
+                grown = sites
+            else:
+                grown = dict([(site, grown[site] + size) for site, size in sites.items() if site in grown])
+        return sorted([(site, size) for site, size in grown.items() if size >= self.growth_bytes],
+                      key=lambda item: -item[1])
+
+    def report(self):
+        '''This method returns a text report: the traced memory, the census
+        of the last sample, memory at every wave start, the sites grown
+        since the monitor started, and the flagged sites.'''
+        snapshot = self.snapshot()
+        current = self.traced(snapshot)
+        lines = ["traced %d KB, %d KB since start, %.0f bytes per live entity" % (
+            current // 1024, (current - self.baseline) // 1024, self.bytes_per_entity())]
+        if self.samples:
+            last = self.samples[-1]
+            lines.append("")
+            lines.append("tick %d, wave %d, %d live entities" % (last["tick"], last["wave"], last["entities"]))
+            lines.append("%-16s %8s %8s %8s %14s %16s" % ("class", "live", "pooled", "surfaces", "surface bytes",
+                                                          "if not shared"))
+            for name, entry in sorted(last["census"].items()):
+                lines.append("%-16s %8d %8d %8d %14d %16d" % (name, entry["count"], entry["free"], entry["surfaces"],
+                                                              entry["surface_bytes"], entry["referenced_bytes"]))
+        if self.waves:
+            lines.append("")
+            lines.append("game  wave start      tick   traced KB   entities")
+            for game, wave, tick, traced, entities in self.waves:
+                lines.append("%4d %10d %9d %11d %10d" % (game, wave, tick, traced // 1024, entities))
+        lines.append("")
+        lines.append("grown since start:")
+        for site, size, count in self.diff(snapshot, self.__first):
+            lines.append("  %+9d B %+7d blocks  %s" % (size, count, site))
+        flagged = self.growth()
+        lines.append("")
+        lines.append("grown every wave for the last %d waves: %s" % (self.growth_waves, "none" if not flagged else ""))
+        for site, size in flagged:
+            lines.append("  %+9d B  %s" % (size, site))
+        return "\n".join(lines)
+
+    def dump(self, filename=None):
+        '''This method writes the report to a file, or prints it.'''
+        report = self.report()
+        if filename:
+            with open(filename, "w") as output:
+                output.write(report + "\n")
+        else:
+            print(report)
+        return report
+
+    def stop(self):
+        '''This method stops tracemalloc, if this monitor started it.'''
+        if self.__started_tracing:
+            tracemalloc.stop()
+            self.__started_tracing = False
+
+def soak(games=5, limit=16384, max_ticks=36000, seed=0, interval=900, min_entities=10):
+    '''This function plays games headless with a random player, one after
+    another, sampling memory as they go. It returns the monitor, the worst
+    memory per live entity of any sample with at least min_entities
+    entities, and whether the soak passed, i.e. that was at most limit
+    bytes.'''
+    import pyBoxheadSim
+    screen = pyBoxheadSim.headless_screen()
+    monitor = None
+    worst = 0.0
+    for game in range(games):
+        simulation = pyBoxheadSim.Simulation(screen, seed + game)
+        if monitor is None:
+            # Memory is measured from after the first game has loaded.
+            monitor = MemoryMonitor(interval)
+        else:
+            monitor.new_game()
+        policy = pyBoxheadSim.random_policy(seed + game)
+        state = simulation.state()
+        while not simulation.finished and simulation.tick < max_ticks:
+            hat, shots = policy(state)
+            state = simulation.step(hat, shots)
+            samples = len(monitor.samples)
+            monitor.tick(simulation)
+            if len(monitor.samples) != samples and monitor.samples[-1]["entities"] >= min_entities:
+                worst = max(worst, monitor.bytes_per_entity())
+        print("game %d: %d ticks, wave %d, %.0f bytes per live entity, worst %.0f" % (
+            game + 1, simulation.tick, state["wave"], monitor.bytes_per_entity(), worst))
+    return monitor, worst, worst <= limit
+
+def main():
+    '''This function runs the soak test from the command line, and exits
+    with status 1 when it fails.'''
+    import argparse
+    parser = argparse.ArgumentParser(description="Play headless pyBoxhead games and check memory per live entity.")
+    parser.add_argument("--games", type=int, default=5)
+    parser.add_argument("--ticks", type=int, default=36000, help="longest game, in ticks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--interval", type=int, default=900, help="ticks between samples")
+    parser.add_argument("--limit", type=int, default=16384, help="most bytes per live entity")
+    parser.add_argument("--dump", help="file to write the report to")
+    args = parser.parse_args()
+    monitor, worst, passed = soak(args.games, args.limit, args.ticks, args.seed, args.interval)
+    monitor.dump(args.dump)
+    if not passed:
+        print("FAILED: %.0f bytes per live entity, over the limit of %d" % (worst, args.limit))
+        sys.exit(1)
+    print("passed: at most %.0f bytes per live entity (limit %d)" % (worst, args.limit))
+
+if __name__ == "__main__":
+    main()
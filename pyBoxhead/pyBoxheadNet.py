@@ -0,0 +1,627 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Networked co-op for pyBoxhead.
+
+    One server runs the game rules for every player; the clients only send
+    their joystick input and draw what the server tells them. Everything
+    goes over UDP:
+
+    JOIN     client -> server  "J", protocol version
+    WELCOME  server -> client  "W", player slot, players, tick rate,
+                               snapshot rate
+    INPUT    client -> server  "I", slot, last snapshot tick received (the
+                               ack), hat position, total shots fired
+    SNAPSHOT server -> client  "S", tick, baseline tick, health, wall
+                               health, wave, kills, flags, sounds, then
+                               the players, zombies, bullets and new
+                               explosions
+
+    Input is sent every client frame and holds the total number of shots,
+    so a lost packet loses no bullets. Snapshots are sent snapshot_rate
+    times per second. Positions are quantized to QUANTUM pixels, and each
+    snapshot only holds what changed since the baseline, the last snapshot
+    the client acknowledged: removed entities, new ones, and moved ones as
+    one byte when the move is small. The client draws the game a little in
+    the past, interpolating between the two snapshots around that time.
+
+    Usage, e.g. on one machine:
+        python pyBoxheadNet.py server --players 2
+        python pyBoxheadNet.py client
+        python pyBoxheadNet.py client --bot
+'''
+import collections, socket, struct, time, timeit, pygame
+import pyBoxheadSim, pyBoxheadSprites, pyBoxheadEffects, pyBoxheadTiming
+from pyBoxheadReplay import varint, hat_code, hat_value
+
+PROTOCOL = 1
+DEFAULT_PORT = 5029
+# Positions are sent in units of QUANTUM pixels, 10 bits per axis.
+QUANTUM = 2
+# Snapshots kept, on both sides, to be used as baselines.
+HISTORY = 64
+# Sound effects a snapshot can ask for, one bit each.
+SOUNDS = ("gun_shot", "explosion_sound", "next_wave", "player_death", "gameover_voice")
+ENTITY_KINDS = ("players", "zombies", "bullets")
+HEADER = struct.Struct("<cIIhhHHBB")
+INPUT = struct.Struct("<cBIBH")
+WELCOME = struct.Struct("<cBBBB")
+
+def quantize(position):
+    '''This function returns a pixel position in QUANTUM units, clamped to
+    what 10 bits hold.'''
+    return (min(max(int(position[0]) // QUANTUM, 0), 1023),
+            min(max(int(position[1]) // QUANTUM, 0), 1023))
+
+def unquantize(position):
+    '''This function returns the pixel position in the middle of a quantum.'''
+    return (position[0] * QUANTUM + QUANTUM // 2, position[1] * QUANTUM + QUANTUM // 2)
+
+class Reader(object):
+    '''This class reads the fields of a packet in order.'''
+    def __init__(self, data, position=0):
+        '''This initializer takes the packet and where to start reading.'''
+        self.data = bytearray(data)
+        self.position = position
+
+    def byte(self):
+        '''This method reads one unsigned byte.'''
+        value = self.data[self.position]
+        self.position += 1
+        return value
+
+    def varint(self):
+        '''This method reads a varint written by pyBoxheadReplay.varint().'''
+        number = 0
+        shift = 0
+        while True:
+            byte = self.byte()
+            number |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                return number
+
+    def position3(self):
+        '''This method reads a quantized position packed in three bytes.'''
+        packed = self.byte() | self.byte() << 8 | self.byte() << 16
+        return (packed >> 10, packed & 1023)
+
+def pack_position(position):
+    '''This function packs a quantized position in three bytes.'''
+    packed = position[0] << 10 | position[1]
+    return bytearray((packed & 0xff, packed >> 8 & 0xff, packed >> 16))
+
+def encode_entities(current, baseline):
+    '''This function encodes one kind of entity, id -> quantized position,
+    as the change from baseline: the removed ids, then the new and moved
+    entities. Ids are sent as gaps from the previous id.'''
+    encoded = bytearray()
+    removed = sorted([number for number in baseline if number not in current])
+    encoded += varint(len(removed))
+    last = 0
+    for number in removed:
+        encoded += varint(number - last)
+        last = number
+    changed = sorted([number for number, position in current.items()
+                      if baseline.get(number) != position])
+    encoded += varint(len(changed))
+    last = 0
+    for number in changed:
+        position = current[number]
+        old = baseline.get(number)
+        gap = number - last
+        last = number
+        if old is not None and -8 <= position[0] - old[0] < 8 and -8 <= position[1] - old[1] < 8:
+            # A small move, in one byte.
+            encoded += varint(gap << 1 | 1)
+            encoded.append((position[0] - old[0] + 8) << 4 | (position[1] - old[1] + 8))
+        else:
+            encoded += varint(gap << 1)
+            encoded += pack_position(position)
+    return encoded
+
+def decode_entities(reader, baseline):
+    '''This function decodes what encode_entities() wrote, on top of the
+    baseline entities, and returns the new id -> position dictionary.'''
+    current = dict(baseline)
+    last = 0
+    for count in range(reader.varint()):
+        last += reader.varint()
+        current.pop(last, None)
+    last = 0
+    for count in range(reader.varint()):
+        tagged = reader.varint()
+        last += tagged >> 1
+        if tagged & 1:
+            move = reader.byte()
+            old = current[last]
+            current[last] = (old[0] + (move >> 4) - 8, old[1] + (move & 15) - 8)
+        else:
+            current[last] = reader.position3()
+    return current
+
+def capture(simulation, sounds):
+    '''This function takes a snapshot of a Simulation: a dictionary with the
+    tick, the HUD values, the quantized players, zombies and bullets by id,
+    the explosions playing, and the sounds asked for since the last one.'''
+    players = {}
+    for number, player in enumerate(simulation.players):
+        if player.alive():
+            players[number] = quantize(player.rect.center)
+    mask = 0
+    for sound in sounds:
+        mask |= 1 << SOUNDS.index(sound)
+    return {"tick": simulation.tick,
+            "health": simulation.health_level.get_health(),
+            "wall": simulation.wall_level.get_health(),
+            "wave": simulation.wave_level.get_wave(),
+            "kills": simulation.zombies_killed,
+            "finished": simulation.finished,
+            "sounds": mask,
+            "players": players,
+            "zombies": dict([(zombie.serial, quantize(zombie.rect.center)) for zombie in simulation.zombieGroup]),
+            "bullets": dict([(bullet.serial, quantize(bullet.rect.center)) for bullet in simulation.bulletGroup]),
+            "explosions": [(quantize((x, y)), start) for x, y, start in simulation.explosions.active()]}
+
+def encode_snapshot(snapshot, baseline=None):
+    '''This function encodes a snapshot as the change from a baseline
+    snapshot the client has, or in full without one.'''
+    baseline_tick = 0
+    if baseline is not None:
+        baseline_tick = baseline["tick"]
+    encoded = bytearray(HEADER.pack(b"S", snapshot["tick"], baseline_tick,
+                                    snapshot["health"], snapshot["wall"], snapshot["wave"],
+                                    min(snapshot["kills"], 0xffff), int(snapshot["finished"]),
+                                    snapshot["sounds"]))
+    for kind in ENTITY_KINDS:
+        encoded += encode_entities(snapshot[kind], baseline[kind] if baseline else {})
+    # The client has every explosion that started by the baseline tick.
+    explosions = [(position, start) for position, start in snapshot["explosions"]
+                  if start > baseline_tick]
+    encoded += varint(len(explosions))
+    for position, start in explosions:
+        encoded += pack_position(position)
+        encoded.append(min(snapshot["tick"] - start, 255))
+    return bytes(encoded)
+
+def decode_snapshot(data, baselines):
+    '''This function decodes a snapshot packet, given the snapshots already
+    received by tick. It returns None if the baseline is not among them.'''
+    fields = HEADER.unpack_from(data)
+    tick, baseline_tick = fields[1], fields[2]
+    baseline = None
+    if baseline_tick:
+        baseline = baselines.get(baseline_tick)
+        if baseline is None:
+            return None
+    reader = Reader(data, HEADER.size)
+    snapshot = {"tick": tick, "health": fields[3], "wall": fields[4], "wave": fields[5],
+                "kills": fields[6], "finished": bool(fields[7] & 1), "sounds": fields[8]}
+    for kind in ENTITY_KINDS:
+        snapshot[kind] = decode_entities(reader, baseline[kind] if baseline else {})
+    snapshot["explosions"] = []
+    for count in range(reader.varint()):
+        position = reader.position3()
+        snapshot["explosions"].append((position, tick - reader.byte()))
+    return snapshot
+
+class GameServer(object):
+    '''This class runs a co-op game for players clients, and sends them
+    snapshots of it.'''
+    def __init__(self, players=2, port=DEFAULT_PORT, host="", snapshot_rate=20, tick_rate=30, seed=None):
+        '''This initializer takes the number of players to wait for, the
+        UDP port and address to listen on, the snapshots per second, the
+        simulation ticks per second and the seed of the game.'''
+        if snapshot_rate < 1:
+            raise ValueError("a server needs at least 1 snapshot per second, not %s" % snapshot_rate)
+        self.players = players
+        self.tick_rate = tick_rate
+        # At most one snapshot per tick.
+        self.snapshot_rate = min(snapshot_rate, tick_rate)
+        # Every tick adds snapshot_rate, and a snapshot is sent for every
+        # tick_rate it holds, so e.g. 20 of every 30 ticks send one.
+        self.__snapshot_due = 0
+        self.seed = seed
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.socket.setblocking(False)
+        # Per client address: slot, acked snapshot tick, hat, shots total
+        # seen, and the hat last given to the simulation.
+        self.clients = {}
+        self.__history = collections.OrderedDict()
+        self.__sounds = []
+        self.simulation = None
+        self.bytes_sent = 0
+        self.snapshots_sent = 0
+        self.__encode_times = collections.deque(maxlen=1000)
+        self.encode_worst = 0.0
+
+    def receive(self):
+        '''This method handles every packet waiting on the socket.'''
+        while True:
+            try:
+                data, address = self.socket.recvfrom(2048)
+            except socket.error:
+                return
+            if not data:
+                continue
+            kind = data[:1]
+            if kind == b"J" and len(data) >= 2 and bytearray(data)[1] == PROTOCOL:
+                self.__join(address)
+            elif kind == b"I" and len(data) == INPUT.size and address in self.clients:
+                self.__input(address, INPUT.unpack(data))
+
+    def __join(self, address):
+        '''This method gives a client a player slot, if one is free, and
+        welcomes it.'''
+        client = self.clients.get(address)
+        if client is None:
+            if len(self.clients) >= self.players:
+                return
+            client = {"slot": len(self.clients), "ack": 0, "hat": None, "last_hat": None,
+                      "shots": None, "pending": 0}
+            self.clients[address] = client
+        self.socket.sendto(WELCOME.pack(b"W", client["slot"], self.players, self.tick_rate,
+                                        self.snapshot_rate), address)
+
+    def __input(self, address, fields):
+        '''This method takes the input of a client.'''
+        client = self.clients[address]
+        slot, ack, code, shots = fields[1], fields[2], fields[3], fields[4]
+        if slot != client["slot"]:
+            return
+        if ack > client["ack"]:
+            client["ack"] = ack
+        if code:
+            client["hat"] = hat_value(code)
+        if client["shots"] is None:
+            client["shots"] = shots
+        new_shots = (shots - client["shots"]) & 0xffff
+        # A packet from before the last one (reordered) is ignored.
+        if new_shots < 0x8000:
+            client["pending"] += new_shots
+            client["shots"] = shots
+
+    def inputs(self):
+        '''This method returns the (hat, shots) input of every player for
+        the next step. The hat is only passed on when it moves.'''
+        inputs = [(None, 0)] * self.players
+        for client in self.clients.values():
+            hat = client["hat"]
+            if hat == client["last_hat"]:
+                hat = None
+            else:
+                client["last_hat"] = hat
+            inputs[client["slot"]] = (hat, client["pending"])
+            client["pending"] = 0
+        return inputs
+
+    def send_snapshots(self):
+        '''This method takes a snapshot and sends it to every client, as the
+        change from the last snapshot that client acknowledged.'''
+        snapshot = capture(self.simulation, self.__sounds)
+        self.__sounds = []
+        self.__history[snapshot["tick"]] = snapshot
+        while len(self.__history) > HISTORY:
+            self.__history.popitem(False)
+        for address, client in self.clients.items():
+            start = timeit.default_timer()
+            packet = encode_snapshot(snapshot, self.__history.get(client["ack"]))
+            encode_time = timeit.default_timer() - start
+            self.__encode_times.append(encode_time)
+            self.encode_worst = max(self.encode_worst, encode_time)
+            self.socket.sendto(packet, address)
+            self.bytes_sent += len(packet)
+            self.snapshots_sent += 1
+
+    def stats(self):
+        '''This method returns the bytes sent per tick (to all clients), per
+        snapshot, and the mean and worst snapshot encode time in
+        milliseconds.'''
+        ticks = max(1, self.simulation.tick if self.simulation else 0)
+        times = self.__encode_times
+        return {"bytes_per_tick": self.bytes_sent / float(ticks),
+                "bytes_per_snapshot": self.bytes_sent / float(max(1, self.snapshots_sent)),
+                "encode_ms": sum(times) / max(1, len(times)) * 1000,
+                "encode_worst_ms": self.encode_worst * 1000}
+
+    def run(self, report_every=5.0):
+        '''This method waits for every player to join, then plays the game
+        until it is finished, printing the stats every report_every
+        seconds. It returns the final stats.'''
+        print("waiting for %d players on port %d" % (self.players, self.socket.getsockname()[1]))
+        while len(self.clients) < self.players:
+            self.receive()
+            time.sleep(0.01)
+        screen = pyBoxheadSim.headless_screen()
+        self.simulation = pyBoxheadSim.Simulation(screen, self.seed, players=self.players)
+        timestep = pyBoxheadTiming.FixedStep(self.tick_rate)
+        report = time.time() + report_every
+        while not self.simulation.finished:
+            for step in range(timestep.advance(time.time() * 1000)):
+                self.receive()
+                state = self.simulation.step(inputs=self.inputs())
+                self.__sounds.extend(state["sounds"])
+                self.__snapshot_due += self.snapshot_rate
+                if self.__snapshot_due >= self.tick_rate or state["finished"]:
+                    self.__snapshot_due %= self.tick_rate
+                    self.send_snapshots()
+                if state["finished"]:
+                    break
+            if time.time() >= report:
+                report += report_every
+                print(self.report())
+            time.sleep(0.002)
+        # The last snapshot is sent a few more times, in case it is lost.
+        for repeat in range(5):
+            time.sleep(1.0 / self.snapshot_rate)
+            self.receive()
+            self.send_snapshots()
+        print(self.report())
+        return self.stats()
+
+    def report(self):
+        '''This method returns the stats as one line of text.'''
+        stats = self.stats()
+        return ("tick %d: %.1f bytes/tick, %.1f bytes/snapshot, encode %.3f ms mean, %.3f ms worst" %
+                (self.simulation.tick, stats["bytes_per_tick"], stats["bytes_per_snapshot"],
+                 stats["encode_ms"], stats["encode_worst_ms"]))
+
+class GameClient(object):
+    '''This class joins a GameServer, sends it input and keeps the
+    snapshots it receives.'''
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, delay=0.1):
+        '''This initializer takes the server address, and how far in the
+        past, in seconds, the game is drawn, which leaves room to
+        interpolate between snapshots.'''
+        self.server = (host, port)
+        self.delay = delay
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        self.slot = None
+        self.players = 0
+        self.tick_rate = 30
+        self.snapshots = collections.OrderedDict()
+        self.latest = None
+        self.__latest_time = 0.0
+        self.hat = None
+        self.shots = 0
+        # Explosions already started, so a resent one is not started again.
+        self.__seen = set()
+        self.bytes_received = 0
+
+    def join(self, timeout=30.0):
+        '''This method asks the server for a player slot until it answers,
+        and returns whether it did.'''
+        give_up = time.time() + timeout
+        while time.time() < give_up:
+            self.socket.sendto(b"J" + struct.pack("<B", PROTOCOL), self.server)
+            wait = time.time() + 0.25
+            while time.time() < wait:
+                try:
+                    data, address = self.socket.recvfrom(2048)
+                except socket.error:
+                    time.sleep(0.01)
+                    continue
+                if data[:1] == b"W" and len(data) == WELCOME.size:
+                    fields = WELCOME.unpack(data)
+                    self.slot, self.players, self.tick_rate = fields[1], fields[2], fields[3]
+                    return True
+        return False
+
+    def send_input(self, hat, shots):
+        '''This method sends the input of this frame: the hat if it moved
+        (or None), and the number of button presses.'''
+        if hat is not None:
+            self.hat = hat
+        self.shots = (self.shots + shots) & 0xffff
+        ack = self.latest["tick"] if self.latest else 0
+        self.socket.sendto(INPUT.pack(b"I", self.slot, ack, hat_code(self.hat), self.shots), self.server)
+
+    def receive(self):
+        '''This method decodes every snapshot waiting on the socket, and
+        returns the explosions and sounds of the new ones.'''
+        explosions = []
+        sounds = 0
+        while True:
+            try:
+                data, address = self.socket.recvfrom(65536)
+            except socket.error:
+                break
+            if data[:1] != b"S":
+                continue
+            self.bytes_received += len(data)
+            snapshot = decode_snapshot(data, self.snapshots)
+            if snapshot is None or snapshot["tick"] in self.snapshots:
+                continue
+            self.snapshots[snapshot["tick"]] = snapshot
+            while len(self.snapshots) > HISTORY:
+                self.snapshots.popitem(False)
+            if self.latest is None or snapshot["tick"] > self.latest["tick"]:
+                self.latest = snapshot
+                self.__latest_time = time.time()
+                sounds |= snapshot["sounds"]
+            for position, start in snapshot["explosions"]:
+                if (position, start) not in self.__seen:
+                    self.__seen.add((position, start))
+                    explosions.append((unquantize(position), start))
+        if self.latest is not None:
+            # Explosions long over can no longer be resent.
+            old = self.latest["tick"] - 2 * HISTORY
+            self.__seen = set([entry for entry in self.__seen if entry[1] > old])
+        return explosions, [name for bit, name in enumerate(SOUNDS) if sounds & 1 << bit]
+
+    def render_tick(self):
+        '''This method returns the (fractional) server tick to draw now.'''
+        if self.latest is None:
+            return 0.0
+        elapsed = time.time() - self.__latest_time
+        return self.latest["tick"] + (elapsed - self.delay) * self.tick_rate
+
+    def interpolate(self, tick):
+        '''This method returns the latest snapshot at or before tick, and the
+        pixel positions of every player, zombie and bullet at tick,
+        interpolated between the snapshots around it.'''
+        before = after = None
+        for snapshot in self.snapshots.values():
+            if snapshot["tick"] <= tick and (before is None or snapshot["tick"] > before["tick"]):
+                before = snapshot
+            if snapshot["tick"] > tick and (after is None or snapshot["tick"] < after["tick"]):
+                after = snapshot
+        if before is None:
+            before = after
+        if before is None:
+            return None, {}
+        alpha = 0.0
+        if after is not None and after is not before:
+            alpha = (tick - before["tick"]) / float(after["tick"] - before["tick"])
+        positions = {}
+        for kind in ENTITY_KINDS:
+            positions[kind] = []
+            for number, position in sorted(before[kind].items()):
+                x, y = unquantize(position)
+                if after is not None and number in after[kind]:
+                    next_x, next_y = unquantize(after[kind][number])
+                    x += (next_x - x) * alpha
+                    y += (next_y - y) * alpha
+                positions[kind].append((int(round(x)), int(round(y))))
+        return before, positions
+
+class ClientView(object):
+    '''This class draws what a GameClient receives, like the local game.'''
+    def __init__(self, screen):
+        '''This initializer takes the screen to draw on.'''
+        from pyBoxheadAssets import assets
+        self.screen = screen
+        self.background = assets.opaque_image("boxheadbg.png")
+        self.images = {"players": assets.image("player.png"),
+                       "zombies": assets.image("zombie.png"),
+                       "bullets": assets.image("bullet.png")}
+        self.explosions = pyBoxheadEffects.ExplosionEffects()
+        # The HUD sprites of the local game, kept in step with the server.
+        self.health_level = pyBoxheadSprites.PlayerKeeper()
+        self.wall_level = pyBoxheadSprites.WallKeeper()
+        self.wave_level = pyBoxheadSprites.WaveKeeper()
+        self.game_over = pyBoxheadSprites.GameOver()
+
+    def add_explosions(self, explosions):
+        '''This method starts the explosions a snapshot reported.'''
+        for (x, y), start in explosions:
+            self.explosions.add(x, y, start)
+
+    def draw(self, snapshot, positions, tick):
+        '''This method draws the whole screen for the given snapshot and
+        interpolated positions, at server tick tick.'''
+        screen = self.screen
+        screen.blit(self.background, (0, 0))
+        if snapshot is None:
+            pygame.display.flip()
+            return
+        health = self.health_level.get_health()
+        if snapshot["health"] < health:
+            self.health_level.player_hit(health - snapshot["health"])
+        wall = self.wall_level.get_health()
+        if snapshot["wall"] < wall:
+            self.wall_level.wall_hit(wall - snapshot["wall"])
+        while self.wave_level.get_wave() < snapshot["wave"]:
+            self.wave_level.wave_increase()
+        sequence = []
+        for keeper in (self.health_level, self.wall_level, self.wave_level):
+            keeper.update()
+            sequence.append((keeper.image, keeper.rect))
+        # Same order as the local game: players, zombies, bullets, explosions.
+        for kind in ENTITY_KINDS:
+            image = self.images[kind]
+            width, height = image.get_size()
+            for x, y in positions[kind]:
+                sequence.append((image, (x - width // 2, y - height // 2)))
+        tick = int(tick)
+        self.explosions.update(tick)
+        sequence.extend(self.explosions.sequence(tick))
+        if snapshot["finished"]:
+            sequence.append((self.game_over.image, self.game_over.rect))
+        screen.blits(sequence, False)
+        pygame.display.flip()
+
+def play(client, bot=False, headless=False, fps=60):
+    '''This function plays a networked game as client: joystick input (or a
+    random player with bot set) goes to the server, and the game is drawn
+    from its snapshots (unless headless). It returns the last snapshot.'''
+    import pyBoxheadInput, pyBoxheadAudio
+    if headless:
+        pyBoxheadSim.headless_screen()
+        view = None
+    else:
+        pygame.init()
+        pygame.display.set_caption("pyBoxhead co-op, player %d" % (client.slot + 1))
+        view = ClientView(pygame.display.set_mode(pyBoxheadSim.SCREEN_SIZE))
+    voices = None
+    if not headless and pygame.mixer.get_init():
+        voices = pyBoxheadAudio.game_voices()
+    policy = None
+    joysticks = []
+    if bot:
+        policy = pyBoxheadSim.random_policy(client.slot)
+    else:
+        pygame.joystick.init()
+        joysticks = [pygame.joystick.Joystick(number) for number in range(pygame.joystick.get_count())]
+        for stick in joysticks:
+            stick.init()
+    controls = pyBoxheadInput.InputLayer(joysticks)
+    controls.allow()
+    clock = pygame.time.Clock()
+    finished_at = None
+    while True:
+        clock.tick(fps)
+        for event in controls.poll():
+            if event.type == pygame.QUIT:
+                return client.latest
+        if policy:
+            hat, shots = policy(None)
+        else:
+            hat, shots = controls.take()
+        client.send_input(hat, shots)
+        explosions, sounds = client.receive()
+        if voices:
+            for sound in sounds:
+                voices.play(sound)
+            voices.flush()
+        tick = client.render_tick()
+        snapshot, positions = client.interpolate(tick)
+        if view:
+            view.add_explosions(explosions)
+            view.draw(snapshot, positions, tick)
+        if client.latest is not None and client.latest["finished"]:
+            # Keep drawing for a moment so the end of the game is seen.
+            if finished_at is None:
+                finished_at = time.time()
+            elif time.time() - finished_at > (3.0 if view else client.delay):
+                return client.latest
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Networked co-op pyBoxhead.")
+    parser.add_argument("role", choices=("server", "client"))
+    parser.add_argument("--host", default="127.0.0.1", help="server address (client)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--players", type=int, default=2, help="players to wait for (server)")
+    parser.add_argument("--snapshot-rate", type=int, default=20, help="snapshots per second (server)")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the game (server)")
+    parser.add_argument("--delay", type=float, default=0.1, help="interpolation delay in seconds (client)")
+    parser.add_argument("--bot", action="store_true", help="play with a random player (client)")
+    parser.add_argument("--headless", action="store_true", help="do not open a window (client)")
+    args = parser.parse_args()
+    if args.snapshot_rate < 1:
+        parser.error("--snapshot-rate must be at least 1")
+    if args.role == "server":
+        GameServer(args.players, args.port, snapshot_rate=args.snapshot_rate, seed=args.seed).run()
+    else:
+        client = GameClient(args.host, args.port, args.delay)
+        if not client.join():
+            raise SystemExit("no answer from %s:%d" % (args.host, args.port))
+        print("joined as player %d of %d" % (client.slot + 1, client.players))
+        last = play(client, args.bot, args.headless)
+        if last is not None:
+            print("game over at tick %d: wave %d, %d kills, %d bytes received" % (
+                last["tick"], last["wave"], last["kills"], client.bytes_received))
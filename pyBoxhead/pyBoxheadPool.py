@@ -0,0 +1,70 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Sprite pools for pyBoxhead.
+
+    Bullets, zombies and explosions are created and killed all game long.
+    A pool keeps killed sprites and hands them out again on the next spawn,
+    so a long game does not keep feeding the garbage collector.
+
+'''
+
+class SpritePool(object):
+    '''This class keeps killed sprites of one class for reuse. The sprite
+    class must take the pool arguments first in its initializer, followed by
+    the spawn arguments, and must have a reset() method taking the spawn
+    arguments.'''
+    def __init__(self, sprite_class, *args):
+        '''This initializer takes the sprite class, and the arguments every
+        sprite of the pool is created with (e.g. the screen).'''
+        self.__sprite_class = sprite_class
+        self.__args = args
+        self.__free = []
+        self.__live = 0
+        self.__created = 0
+        self.__high_water = 0
+        # Every acquire gets the next serial number, so a reused sprite can
+        # be told apart from its previous life (e.g. over the network).
+        self.__serial = 0
+
+    def acquire(self, *args):
+        '''This method returns a sprite placed with the spawn arguments,
+        reusing a killed sprite when one is free.'''
+        if self.__free:
+            sprite = self.__free.pop()
+            sprite.reset(*args)
+        else:
+            sprite = self.__sprite_class(*(self.__args + args))
+            sprite.pool = self
+            self.__created += 1
+        self.__serial += 1
+        sprite.serial = self.__serial
+        self.__live += 1
+        if self.__live > self.__high_water:
+            self.__high_water = self.__live
+        return sprite
+
+    def release(self, sprite):
+        '''This method takes back a killed sprite. It is called by kill().'''
+        self.__live -= 1
+        self.__free.append(sprite)
+
+    def reserve(self, count, *args):
+        '''This method creates sprites ahead of time, until at least count
+        sprites are free, e.g. before a wave with many spawns. The spawn
+        arguments are only used to build the sprites.'''
+        while len(self.__free) < count:
+            sprite = self.__sprite_class(*(self.__args + args))
+            sprite.pool = self
+            self.__created += 1
+            self.__free.append(sprite)
+
+    def stats(self):
+        '''This method returns a dictionary with the number of sprites in use,
+        free, created in total, and the most ever in use at once.'''
+        return {"live": self.__live,
+                "free": len(self.__free),
+                "size": self.__live + len(self.__free),
+                "created": self.__created,
+                "high_water": self.__high_water}
@@ -0,0 +1,161 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Frame profiler for pyBoxhead.
+
+    The main loop and the simulation call mark() after each phase of a frame
+    (events, spawning, the three collision checks, sprite updates, drawing,
+    display update). The profiler keeps rolling averages and the worst frames,
+    can show them in an overlay, and can export every recorded frame as CSV or
+    as a Chrome trace (chrome://tracing or https://ui.perfetto.dev).
+
+    When profiling is off the game holds None instead of a profiler, so the
+    only cost left is one "if" per phase.
+
+'''
+import collections, json, timeit, pygame
+
+class FrameProfiler(object):
+    '''This class times the phases of every frame.'''
+    def __init__(self, history=120, timer=timeit.default_timer):
+        '''This initializer takes the number of frames the rolling averages
+        and worst frame are taken over, and the timer function in seconds.'''
+        self.__timer = timer
+        self.__history = collections.deque(maxlen=history)
+        self.__phases = []
+        self.__frame_start = None
+        self.__last = None
+        self.__segments = []
+        # Every frame since start_recording(), for export.
+        self.recording = False
+        self.__recorded = []
+
+    def begin_frame(self):
+        '''This method starts timing a new frame.'''
+        self.__frame_start = self.__last = self.__timer()
+        self.__segments = []
+
+    def mark(self, phase):
+        '''This method ends the current phase: the time since the last mark
+        (or the start of the frame) is counted towards phase.'''
+        now = self.__timer()
+        self.__segments.append((phase, self.__last, now))
+        self.__last = now
+        if phase not in self.__phases:
+            self.__phases.append(phase)
+
+    def end_frame(self):
+        '''This method finishes the frame and adds it to the history.'''
+        if self.__frame_start is None:
+            return
+        totals = {}
+        for phase, start, end in self.__segments:
+            totals[phase] = totals.get(phase, 0.0) + end - start
+        frame = (self.__frame_start, self.__last - self.__frame_start, totals)
+        self.__history.append(frame)
+        if self.recording:
+            self.__recorded.append((self.__frame_start, self.__last, self.__segments))
+        self.__frame_start = None
+
+    def start_recording(self):
+        '''This method starts keeping every frame for export.'''
+        self.recording = True
+        self.__recorded = []
+
+    def phases(self):
+        '''This method returns the phase names in the order first seen.'''
+        return list(self.__phases)
+
+    def averages(self):
+        '''This method returns the average frame time and the average time of
+        every phase over the history, in milliseconds.'''
+        count = len(self.__history)
+        if count == 0:
+            return 0.0, {}
+        frame_total = sum([frame[1] for frame in self.__history])
+        phases = {}
+        for phase in self.__phases:
+            phases[phase] = sum([frame[2].get(phase, 0.0) for frame in self.__history]) / count * 1000
+        return frame_total / count * 1000, phases
+
+    def worst(self):
+        '''This method returns the slowest frame of the history, as its time
+        in milliseconds and the time of every phase in milliseconds.'''
+        if not self.__history:
+            return 0.0, {}
+        start, duration, totals = max(self.__history, key=lambda frame: frame[1])
+        phases = {}
+        for phase, seconds in totals.items():
+            phases[phase] = seconds * 1000
+        return duration * 1000, phases
+
+    def export_csv(self, filename):
+        '''This method writes one row per recorded frame with the time of the
+        frame and of every phase, in milliseconds.'''
+        phases = self.phases()
+        with open(filename, "w") as output:
+            output.write(",".join(["frame", "start_ms", "total_ms"] + phases) + "\n")
+            origin = self.__recorded[0][0] if self.__recorded else 0.0
+            for number, (start, end, segments) in enumerate(self.__recorded):
+                totals = {}
+                for phase, segment_start, segment_end in segments:
+                    totals[phase] = totals.get(phase, 0.0) + segment_end - segment_start
+                row = [str(number), "%.3f" % ((start - origin) * 1000), "%.3f" % ((end - start) * 1000)]
+                row += ["%.3f" % (totals.get(phase, 0.0) * 1000) for phase in phases]
+                output.write(",".join(row) + "\n")
+
+    def export_chrome_trace(self, filename):
+        '''This method writes every recorded frame and phase as complete
+        events in the Chrome trace event format.'''
+        events = []
+        origin = self.__recorded[0][0] if self.__recorded else 0.0
+        for number, (start, end, segments) in enumerate(self.__recorded):
+            events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": (start - origin) * 1e6, "dur": (end - start) * 1e6,
+                           "args": {"frame": number}})
+            for phase, segment_start, segment_end in segments:
+                events.append({"name": phase, "ph": "X", "pid": 1, "tid": 1,
+                               "ts": (segment_start - origin) * 1e6,
+                               "dur": (segment_end - segment_start) * 1e6})
+        with open(filename, "w") as output:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, output)
+
+class ProfilerOverlay(pygame.sprite.DirtySprite):
+    '''This class defines a sprite showing the profiler's rolling averages
+    and worst frame in the top left corner.'''
+    def __init__(self, profiler, refresh=15):
+        '''This initializer takes the profiler to show, and how many frames
+        to wait between redraws of the overlay.'''
+        # Call the parent __init__() method
+        pygame.sprite.DirtySprite.__init__(self)
+        self.__profiler = profiler
+        self.__refresh = refresh
+        self.__frames = 0
+        self.__font = pygame.font.Font(None, 18)
+        self.image = pygame.Surface((1, 1), pygame.SRCALPHA)
+        self.rect = self.image.get_rect()
+
+    def update(self):
+        '''This method redraws the overlay every refresh frames.'''
+        self.__frames += 1
+        if self.__frames < self.__refresh:
+            return
+        self.__frames = 0
+        average, phases = self.__profiler.averages()
+        worst, worst_phases = self.__profiler.worst()
+        lines = ["frame  avg %6.2f  worst %6.2f ms" % (average, worst)]
+        for phase in self.__profiler.phases():
+            lines.append("%-16s %6.2f  %6.2f" % (phase, phases.get(phase, 0.0), worst_phases.get(phase, 0.0)))
+        rendered = [self.__font.render(line, 1, (255, 255, 255)) for line in lines]
+        width = max([line.get_width() for line in rendered]) + 8
+        height = sum([line.get_height() for line in rendered]) + 8
+        self.image = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.image.fill((0, 0, 0, 160))
+        y = 4
+        for line in rendered:
+            self.image.blit(line, (4, y))
+            y += line.get_height()
+        self.rect = self.image.get_rect()
+        self.rect.topleft = (4, 4)
+        self.dirty = 1
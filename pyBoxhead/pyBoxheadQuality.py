@@ -0,0 +1,125 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Adaptive quality governor for pyBoxhead.
+
+    The governor is told how long every frame took to run, not counting the
+    time the clock slept, and compares it with the frame budget (1/30 of a
+    second). When the frames of the last window run over budget for long
+    enough, it steps down one quality level; each level keeps what the
+    levels before it gave up:
+
+    full              everything as designed
+    explosion_frames  explosions play every other frame, in half the time
+    explosion_sounds  one explosion sound at a time
+    hud               the HUD is refreshed every sixth frame
+    zombies           at most half the wave table's live zombies
+
+    Quality is only given back one level at a time, after a longer run of
+    frames well under budget, so the game does not flicker between levels.
+
+'''
+import collections, timeit
+
+# (name, settings) of every level, best first. The settings of a level add
+# to those of the levels before it.
+LEVELS = (("full", {}),
+          ("explosion_frames", {"explosion_step": 2}),
+          ("explosion_sounds", {"explosion_voices": 1}),
+          ("hud", {"hud_every": 6}),
+          ("zombies", {"zombie_fraction": 0.5}))
+
+class QualityGovernor(object):
+    '''This class picks the quality level that keeps frames in budget.'''
+    def __init__(self, budget_ms=1000.0 / 30, levels=LEVELS, window=15, degrade=1.0, restore=0.6,
+                 degrade_frames=10, restore_frames=90, timer=timeit.default_timer):
+        '''This initializer takes the frame budget in milliseconds, the
+        quality levels, the number of frames averaged, the fractions of the
+        budget the average must go over to lose quality and stay under to
+        get it back, how many frames in a row that must hold, and the timer
+        function in seconds.'''
+        self.budget_ms = budget_ms
+        self.levels = levels
+        self.degrade = degrade
+        self.restore = restore
+        self.degrade_frames = degrade_frames
+        self.restore_frames = restore_frames
+        self.level = 0
+        self.changes = 0
+        self.__timer = timer
+        self.__window = collections.deque(maxlen=window)
+        self.__over = 0
+        self.__under = 0
+        self.__seconds = [0.0] * len(levels)
+        self.__last = None
+        # The voice limit of the explosion sound before the governor
+        # changed it.
+        self.__explosion_voices = None
+
+    def frame(self, frame_ms):
+        '''This method takes the time the last frame took to run, in
+        milliseconds, and returns whether the quality level changed.'''
+        now = self.__timer()
+        if self.__last is not None:
+            self.__seconds[self.level] += now - self.__last
+        self.__last = now
+        window = self.__window
+        window.append(frame_ms)
+        if len(window) < window.maxlen:
+            return False
+        average = sum(window) / len(window)
+        if average > self.budget_ms * self.degrade:
+            self.__over += 1
+            self.__under = 0
+        elif average < self.budget_ms * self.restore:
+            self.__under += 1
+            self.__over = 0
+        else:
+            self.__over = self.__under = 0
+        if self.__over >= self.degrade_frames and self.level < len(self.levels) - 1:
+            return self.__change(1)
+        if self.__under >= self.restore_frames and self.level > 0:
+            return self.__change(-1)
+        return False
+
+    def __change(self, step):
+        '''This method moves step levels, and starts measuring afresh.'''
+        self.level += step
+        self.changes += 1
+        self.__over = self.__under = 0
+        self.__window.clear()
+        return True
+
+    def settings(self):
+        '''This method returns the settings of the current level.'''
+        settings = {"explosion_step": 1, "explosion_voices": None, "hud_every": 1, "zombie_fraction": None}
+        for name, level in self.levels[:self.level + 1]:
+            settings.update(level)
+        return settings
+
+    def apply(self, simulation, voices=None):
+        '''This method sets up a Simulation, and its pyBoxheadAudio
+        VoiceManager, for the current level.'''
+        settings = self.settings()
+        simulation.explosions.frame_step = settings["explosion_step"]
+        simulation.hud_every = settings["hud_every"]
+        simulation.zombie_limit = None
+        if settings["zombie_fraction"] is not None:
+            simulation.zombie_limit = int(simulation.waves.max_live_zombies * settings["zombie_fraction"])
+        if voices is not None:
+            if self.__explosion_voices is None:
+                self.__explosion_voices = voices.limit("explosion_sound")
+            voices.set_limit("explosion_sound", settings["explosion_voices"] or self.__explosion_voices)
+
+    def name(self):
+        '''This method returns the name of the current level.'''
+        return self.levels[self.level][0]
+
+    def metrics(self):
+        '''This method returns the current level, its name, the number of
+        level changes, and the seconds spent at every level.'''
+        return {"level": self.level,
+                "name": self.name(),
+                "changes": self.changes,
+                "seconds": dict([(name, seconds) for (name, settings), seconds in zip(self.levels, self.__seconds)])}
@@ -0,0 +1,155 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Renderers for pyBoxhead.
+
+    The game is always laid out on a 638x553 logical screen. A renderer puts
+    that screen in a window:
+
+    SurfaceRenderer draws with software Surface blits straight to the
+    display surface, and only updates the rects that changed. This is how
+    the game has always been drawn.
+
+    TextureRenderer uses the SDL2 Renderer from pygame._sdl2. Every sprite
+    image is uploaded to a Texture the first time it is drawn, and each
+    frame is drawn as Texture copies, scaled by SDL to any window size.
+
+    open_renderer() falls back to the SurfaceRenderer when the SDL2
+    Renderer cannot be used, e.g. an old pygame or no video device.
+
+'''
+import weakref, pygame
+
+# Size of the logical screen the game is laid out on.
+LOGICAL_SIZE = (638, 553)
+
+class SurfaceRenderer(object):
+    '''This class draws the game with Surface blits on the display surface.'''
+    name = "surface"
+
+    def __init__(self, caption, window_size=None, fullscreen=False, vsync=False):
+        '''This initializer opens the window, with a caption. Asking for
+        another window size, fullscreen or vsync has pygame scale the display
+        (pygame.SCALED), by the largest whole factor that fits the desktop.'''
+        pygame.display.set_caption(caption)
+        if window_size not in (None, LOGICAL_SIZE) or fullscreen or vsync:
+            # pygame only honours vsync for SCALED or OPENGL displays.
+            flags = pygame.SCALED
+            if fullscreen:
+                flags |= pygame.FULLSCREEN
+            self.screen = pygame.display.set_mode(LOGICAL_SIZE, flags, vsync=int(vsync))
+        else:
+            self.screen = pygame.display.set_mode(LOGICAL_SIZE)
+        self.__dirty = []
+
+    def show(self):
+        '''This method shows the whole screen surface, e.g. for the intro
+        screen.'''
+        pygame.display.flip()
+
+    def start_game(self, simulation, background):
+        '''This method gets ready to draw a game over a background.'''
+        self.screen.blit(background, (0, 0))
+        # The background is only redrawn underneath sprites that changed.
+        simulation.allSprites.clear(self.screen, background)
+        pygame.display.flip()
+
+    def draw_game(self, simulation, alpha=1.0):
+        '''This method draws what changed in the game on the screen
+        surface.'''
+        self.__dirty = simulation.draw(self.screen, alpha)
+
+    def present(self):
+        '''This method updates only the rects of the display that changed
+        in the last draw_game().'''
+        pygame.display.update(self.__dirty)
+        self.__dirty = []
+
+class TextureRenderer(object):
+    '''This class draws the game with SDL2 Renderer texture copies.'''
+    name = "texture"
+
+    def __init__(self, caption, window_size=None, fullscreen=False, vsync=False, accelerated=-1):
+        '''This initializer opens the window, with a caption, at window_size
+        or fullscreen at the desktop resolution. accelerated is -1 to let
+        SDL choose, 1 for a GPU renderer only, 0 for SDL's software
+        renderer. It raises pygame.error if SDL cannot make the renderer.'''
+        from pygame._sdl2 import video
+        self.__video = video
+        self.window = video.Window(caption, size=window_size or LOGICAL_SIZE,
+                                   fullscreen_desktop=fullscreen, resizable=True)
+        try:
+            self.renderer = video.Renderer(self.window, accelerated=accelerated, vsync=vsync)
+        except Exception:
+            self.window.destroy()
+            raise
+        # SDL scales the logical screen to the window, keeping its shape.
+        self.renderer.logical_size = LOGICAL_SIZE
+        # The sprites are placed on an ordinary surface of the logical size;
+        # it is only ever drawn on by the intro screen.
+        self.screen = pygame.Surface(LOGICAL_SIZE)
+        # One texture per image, for as long as the image exists.
+        self.__textures = weakref.WeakKeyDictionary()
+        self.__background = None
+
+    def texture(self, image):
+        '''This method returns the texture of an image, uploading it the
+        first time.'''
+        texture = self.__textures.get(image)
+        if texture is None:
+            texture = self.__video.Texture.from_surface(self.renderer, image)
+            self.__textures[image] = texture
+        return texture
+
+    def show(self):
+        '''This method shows the whole screen surface, e.g. for the intro
+        screen. It is uploaded again every time.'''
+        self.renderer.clear()
+        self.__video.Texture.from_surface(self.renderer, self.screen).draw()
+        self.renderer.present()
+
+    def start_game(self, simulation, background):
+        '''This method gets ready to draw a game over a background.'''
+        self.__background = self.texture(background)
+
+    def draw_game(self, simulation, alpha=1.0):
+        '''This method draws the whole frame as texture copies.'''
+        renderer = self.renderer
+        renderer.draw_color = (0, 0, 0, 255)
+        renderer.clear()
+        if self.__background is not None:
+            self.__background.draw()
+        texture = self.texture
+        for item in simulation.render_list(alpha):
+            image, position = item[0], item[1]
+            area = item[2] if len(item) > 2 else None
+            if area is None:
+                texture(image).draw(dstrect=(position, image.get_size()))
+            else:
+                texture(image).draw(srcrect=area, dstrect=(position, area.size))
+
+    def present(self):
+        '''This method shows the frame drawn by draw_game().'''
+        self.renderer.present()
+
+def open_renderer(backend, caption, window_size=None, fullscreen=False, vsync=False):
+    '''This function opens the window with the "surface" or "texture"
+    renderer, and returns the renderer. If the texture renderer cannot be
+    made, with a GPU or in software, the surface renderer is used instead.'''
+    if backend == "texture":
+        # The dummy video driver (headless runs) has no GPU renderer.
+        tries = (-1, 0)
+        if pygame.display.get_driver() == "dummy":
+            tries = (0,)
+        for accelerated in tries:
+            try:
+                return TextureRenderer(caption, window_size, fullscreen, vsync, accelerated)
+            except (ImportError, pygame.error) as error:
+                print("texture renderer unavailable (%s)" % error)
+                if isinstance(error, ImportError):
+                    break
+        print("falling back to the surface renderer")
+    elif backend != "surface":
+        raise ValueError("unknown renderer: %s" % backend)
+    return SurfaceRenderer(caption, window_size, fullscreen, vsync)
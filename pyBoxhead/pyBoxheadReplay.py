@@ -0,0 +1,285 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Input recording and replay for pyBoxhead.
+
+    A game is fully decided by its random seed, its wave table and the
+    joystick input of every tick, so that is all a recording holds. Ticks
+    without input are not stored at all: each tick with input is one record
+    of the ticks since the previous record (a varint) and one byte holding
+    the hat direction and the number of shots. A 20 minute game is usually
+    a few kilobytes.
+
+    The quality governor may cap the live zombies mid-game, which changes
+    the spawns. Every change of the cap is a record of its own: the ticks
+    since the previous record, the byte LIMIT, and a varint of the cap plus
+    one (0 for no cap). The cap holds from that tick on.
+
+    File layout: the 8 byte magic, a 4 byte little-endian header length, a
+    JSON header (seed, wave table), the records, an end record (a record
+    with no input), and a JSON summary of the final state, which a replay
+    is checked against.
+
+    Usage:
+        python pyBoxheadReplay.py recording.pbr            (fast-forward, headless)
+        python pyBoxheadReplay.py recording.pbr --realtime (watch it at 30 ticks/s)
+'''
+import json, struct, heapq, timeit, pygame, pyBoxheadSim, pyBoxheadWaves
+
+MAGIC = b"PBXREC02"
+# Recordings from before zombie cap records; they are read the same way.
+OLD_MAGICS = (b"PBXREC01",)
+# State compared between a recording's summary and its replay.
+SUMMARY_KEYS = ("tick", "zombies_killed", "wave", "player_health", "wall_health", "player", "finished")
+# Shots at or above this are followed by a varint with the rest.
+MANY_SHOTS = 15
+# The byte of a zombie cap record: a hat code no hat has, and no shots.
+LIMIT = 0x0f
+
+def hat_code(hat):
+    '''This function packs a hat value into 4 bits: 0 for no hat motion,
+    1 to 9 for the nine (x, y) directions.'''
+    if hat is None:
+        return 0
+    return 1 + (hat[0] + 1) * 3 + (hat[1] + 1)
+
+def hat_value(code):
+    '''This function unpacks a hat value packed by hat_code().'''
+    if code == 0:
+        return None
+    return ((code - 1) // 3 - 1, (code - 1) % 3 - 1)
+
+def varint(number):
+    '''This function encodes a non-negative integer 7 bits per byte.'''
+    encoded = bytearray()
+    while number >= 0x80:
+        encoded.append(number & 0x7f | 0x80)
+        number >>= 7
+    encoded.append(number)
+    return encoded
+
+def summary(state):
+    '''This function returns the parts of a state a replay must match, in a
+    form that survives a trip through JSON.'''
+    result = {}
+    for key in SUMMARY_KEYS:
+        value = state[key]
+        if isinstance(value, tuple):
+            value = list(value)
+        result[key] = value
+    return result
+
+class Recorder(object):
+    '''This class writes the input of a game to a recording file as the game
+    is played.'''
+    def __init__(self, filename, seed, waves=None):
+        '''This initializer takes the file to write, the seed the Simulation
+        was created with and its WaveTable (None for the default waves).'''
+        self.__file = open(filename, "wb")
+        header = {"seed": seed, "waves": waves.table if waves is not None else None}
+        encoded = json.dumps(header).encode("utf-8")
+        self.__file.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+        self.__last = 0
+        self.__limit = None
+        self.records = 0
+
+    def record(self, tick, hat, shots):
+        '''This method records the input of one tick, as passed to
+        Simulation.step(). Ticks must be recorded in order.'''
+        if hat is None and shots == 0:
+            return
+        record = varint(tick - self.__last)
+        record.append(hat_code(hat) | min(shots, MANY_SHOTS) << 4)
+        if shots >= MANY_SHOTS:
+            record += varint(shots - MANY_SHOTS)
+        self.__file.write(record)
+        self.__last = tick
+        self.records += 1
+
+    def limit(self, tick, limit):
+        '''This method records the live zombie cap (None for no cap) the
+        Simulation steps with from tick on, if it changed.'''
+        if limit == self.__limit:
+            return
+        record = varint(tick - self.__last)
+        record.append(LIMIT)
+        record += varint(0 if limit is None else limit + 1)
+        self.__file.write(record)
+        self.__last = tick
+        self.__limit = limit
+
+    def close(self, state):
+        '''This method ends the recording with the final state of the game.'''
+        if self.__file is None:
+            return
+        end = varint(state["tick"] - self.__last)
+        end.append(0)
+        self.__file.write(end)
+        self.__file.write(json.dumps(summary(state)).encode("utf-8"))
+        self.__file.close()
+        self.__file = None
+
+class Recording(object):
+    '''This class holds a recording read back from a file.'''
+    def __init__(self, filename):
+        '''This initializer reads the recording file. A recording cut short
+        (e.g. by a crash) is read up to its last whole record, and has no
+        summary.'''
+        with open(filename, "rb") as recording:
+            data = bytearray(recording.read())
+        if bytes(data[:len(MAGIC)]) not in (MAGIC,) + OLD_MAGICS:
+            raise ValueError("%s is not a pyBoxhead recording" % filename)
+        position = len(MAGIC) + 4
+        length = struct.unpack("<I", bytes(data[len(MAGIC):position]))[0]
+        header = json.loads(bytes(data[position:position + length]).decode("utf-8"))
+        position += length
+        self.seed = header["seed"]
+        self.waves = None
+        if header["waves"] is not None:
+            self.waves = pyBoxheadWaves.WaveTable(header["waves"])
+
+        # (tick, hat, shots) for every tick with input.
+        self.events = []
+        # The zombie cap from a tick on, by tick.
+        self.limits = {}
+        self.summary = None
+        tick = 0
+        try:
+            while True:
+                delta, position = self.__varint(data, position)
+                packed = data[position]
+                position += 1
+                tick += delta
+                if packed == 0:
+                    self.summary = json.loads(bytes(data[position:]).decode("utf-8"))
+                    break
+                if packed == LIMIT:
+                    limit, position = self.__varint(data, position)
+                    self.limits[tick] = limit - 1 if limit else None
+                    continue
+                shots = packed >> 4
+                if shots == MANY_SHOTS:
+                    extra, position = self.__varint(data, position)
+                    shots += extra
+                self.events.append((tick, hat_value(packed & 0x0f), shots))
+        except IndexError:
+            pass
+        self.ticks = tick
+
+    def __varint(self, data, position):
+        '''This method decodes the varint at position, and returns it with
+        the position after it.'''
+        number = 0
+        shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            number |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                return number, position
+
+    def inputs(self):
+        '''This method yields the (hat, shots) input of every tick, for
+        pyBoxheadSim.simulate().'''
+        tick = 0
+        for event_tick, hat, shots in self.events:
+            while tick + 1 < event_tick:
+                tick += 1
+                yield None, 0
+            tick += 1
+            yield hat, shots
+        while tick < self.ticks:
+            tick += 1
+            yield None, 0
+
+    def apply(self, simulation):
+        '''This method sets the zombie cap a Simulation steps with next, when
+        the recording changed it for that tick.'''
+        tick = simulation.tick + 1
+        if tick in self.limits:
+            simulation.zombie_limit = self.limits[tick]
+
+    def matches(self, state):
+        '''This method returns whether a replay's final state matches the
+        recorded summary (always True for a recording cut short).'''
+        return self.summary is None or summary(state) == self.summary
+
+def replay(recording, screen=None, backend="sprites"):
+    '''This function replays a recording headless, as fast as possible, and
+    yields the state after every tick.'''
+    if screen is None:
+        screen = pyBoxheadSim.headless_screen()
+    simulation = pyBoxheadSim.Simulation(screen, recording.seed, backend, recording.waves)
+    for hat, shots in recording.inputs():
+        if simulation.finished:
+            break
+        recording.apply(simulation)
+        yield simulation.step(hat, shots)
+
+def play_realtime(recording, rate=30):
+    '''This function shows a recording in a window at rate ticks per second,
+    without sound, and returns the final state. Closing the window stops it.'''
+    pygame.display.init()
+    pygame.font.init()
+    pygame.display.set_caption("pyBoxhead replay")
+    screen = pygame.display.set_mode(pyBoxheadSim.SCREEN_SIZE)
+    from pyBoxheadAssets import assets
+    background = assets.opaque_image("boxheadbg.png")
+    screen.blit(background, (0, 0))
+    pygame.display.flip()
+    simulation = pyBoxheadSim.Simulation(screen, recording.seed, waves=recording.waves)
+    simulation.allSprites.clear(screen, background)
+    clock = pygame.time.Clock()
+    state = simulation.state()
+    for hat, shots in recording.inputs():
+        clock.tick(rate)
+        if pygame.event.peek(pygame.QUIT):
+            break
+        pygame.event.pump()
+        recording.apply(simulation)
+        state = simulation.step(hat, shots)
+        pygame.display.update(simulation.draw(screen))
+    return state
+
+if __name__ == "__main__":
+    import argparse, sys
+    parser = argparse.ArgumentParser(description="Replay a recorded pyBoxhead game.")
+    parser.add_argument("recording")
+    parser.add_argument("--realtime", action="store_true", help="watch the replay at normal speed")
+    parser.add_argument("--backend", choices=("sprites", "numpy"), default="sprites")
+    parser.add_argument("--slowest", type=int, default=5, help="number of slowest ticks to list")
+    args = parser.parse_args()
+    recording = Recording(args.recording)
+    print("seed %s, %d ticks, %d ticks with input" % (recording.seed, recording.ticks, len(recording.events)))
+    if args.realtime:
+        state = play_realtime(recording)
+    else:
+        slowest = []
+        state = None
+        start = last = timeit.default_timer()
+        for state in replay(recording, backend=args.backend):
+            now = timeit.default_timer()
+            heapq.heappush(slowest, (now - last, state["tick"], state["zombies"]))
+            if len(slowest) > args.slowest:
+                heapq.heappop(slowest)
+            last = now
+        elapsed = last - start
+        if state is not None:
+            print("%d ticks in %.2f s (%.0f ticks/s)" % (state["tick"], elapsed, state["tick"] / max(elapsed, 1e-9)))
+        for seconds, tick, zombies in sorted(slowest, reverse=True):
+            print("  tick %d: %.2f ms, %d zombies" % (tick, seconds * 1000, zombies))
+    if state is None:
+        sys.exit(0)
+    if recording.summary is None:
+        print("recording has no summary (cut short); nothing to check")
+    elif recording.matches(state):
+        print("replay matches the recording: wave %d, %d kills" % (state["wave"], state["zombies_killed"]))
+    elif args.realtime and state["tick"] < recording.ticks:
+        print("replay stopped at tick %d" % state["tick"])
+    else:
+        print("replay DIVERGED from the recording")
+        print("  recorded: %s" % json.dumps(recording.summary, sort_keys=True))
+        print("  replayed: %s" % json.dumps(summary(state), sort_keys=True))
+        sys.exit(1)
@@ -0,0 +1,635 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Game simulation for pyBoxhead.
+
+    The rules of the game (spawning, waves, collisions, damage and movement)
+    live here, separate from the window, the mixer and the joystick. main()
+    feeds joystick input into a Simulation and plays the sounds it asks for;
+    the same Simulation can also run headless with scripted input and a
+    seeded random number generator, as fast as the CPU allows.
+
+'''
+import os, random, pygame, pyBoxheadSprites, pyBoxheadCollision, pyBoxheadPool, pyBoxheadWaves, pyBoxheadEffects, pyBoxheadArena, pyBoxheadFlow
+
+# Size of the game window, and of the dummy display used when headless.
+SCREEN_SIZE = (638, 553)
+# Explosions are drawn in place of this layer of allSprites: over the layers
+# below it and under the layers above it.
+EXPLOSION_LAYER = 4
+# In a large arena, zombies further than FAR_MARGIN pixels outside the
+# player's view are only moved every FAR_RATE ticks.
+FAR_MARGIN = 128
+FAR_RATE = 4
+# Pixels a zombie walks per tick.
+ZOMBIE_SPEED = 1.25
+
+class Simulation(object):
+    '''This class holds every sprite and counter of one game, and advances
+    the game one tick (one frame of the original 30 fps loop) at a time.'''
+    def __init__(self, screen, seed=None, backend="sprites", waves=None, player_damage=10, wall_damage=5,
+                 max_explosions=64, players=1, arena=None, pathing="straight"):
+        '''This initializer takes the screen surface the sprites are placed on,
+        an optional seed for the random number generator, the entity
+        backend: "sprites" for Zombie and Bullet sprites, or "numpy" to keep
+        zombies and bullets in a pyBoxheadHorde.Horde, an optional
+        pyBoxheadWaves.WaveTable (the default waves otherwise), the health
+        a zombie takes off the player and off the wall, the most explosions
+        that may play at once, the number of players, and an optional
+        pyBoxheadArena.Arena to play on instead of the screen, and how zombies
+        find their way: "straight" up to the barricade, or "flow" along a
+        pyBoxheadFlow.FlowField toward the barricade or a nearby player.
+        Co-op players share one health bar.'''
+        self.screen = screen
+        # The sprites are placed on the arena, or on the screen without one.
+        # With an arena, the camera decides what part of it is drawn.
+        self.arena = arena
+        self.camera = None
+        field = screen
+        if arena is not None:
+            field = arena
+            self.camera = pyBoxheadArena.Camera(screen.get_size(), arena.get_size())
+        self.field = field
+        # Every random choice in the game comes from this generator, so a
+        # seeded game is repeatable.
+        self.random = random.Random(seed)
+
+        # Single appearing sprites instantiated.
+        self.player = pyBoxheadSprites.Player(field)
+        # In co-op, the other players start to the right of the first.
+        self.players = [self.player]
+        for number in range(1, players):
+            partner = pyBoxheadSprites.Player(field)
+            partner.rect.centerx += 60 * number
+            self.players.append(partner)
+        if self.camera is not None:
+            # The background around the player is built before play starts.
+            self.camera.follow(self.player.rect.center)
+            arena.background().warm(self.camera.view)
+        self.endzone = pyBoxheadSprites.EndZone(field)
+        self.health_level = pyBoxheadSprites.PlayerKeeper()
+        self.wall_level = pyBoxheadSprites.WallKeeper()
+        self.wave_level = pyBoxheadSprites.WaveKeeper()
+        self.game_over = pyBoxheadSprites.GameOver()
+
+        # Sprite group for sprites that appear more than once are created.
+        self.zombieGroup = pygame.sprite.Group()
+        self.bulletGroup = pygame.sprite.Group()
+        # The HUD is only refreshed when the game is drawn.
+        self.hudGroup = pygame.sprite.Group(self.health_level, self.wall_level, self.wave_level)
+
+        # One render group is kept for the whole game. Sprites are added to it once
+        # when created and leave it when killed. Layers keep the original drawing
+        # order: stationary sprites, player, zombies, bullets, (explosions,) game over.
+        self.allSprites = pygame.sprite.LayeredDirty()
+        self.allSprites.add(self.endzone, self.health_level, self.wall_level, self.wave_level, layer=0)
+        self.allSprites.add(self.players, layer=1)
+
+        # Killed bullets and zombies are kept for reuse.
+        self.bulletPool = pyBoxheadPool.SpritePool(pyBoxheadSprites.Bullet, field)
+        self.zombiePool = pyBoxheadPool.SpritePool(pyBoxheadSprites.Zombie, field)
+        # Explosions are not sprites, they are drawn together on top of the
+        # explosion layer.
+        self.explosions = pyBoxheadEffects.ExplosionEffects(max_explosions)
+
+        # Grid of zombie positions used by all three collision checks.
+        self.zombieGrid = pyBoxheadCollision.SpatialHash()
+        # With the numpy backend, zombies and bullets live in the horde
+        # instead of zombieGroup and bulletGroup.
+        self.horde = None
+        if backend == "numpy":
+            import pyBoxheadHorde
+            self.horde = pyBoxheadHorde.Horde(field)
+        elif backend != "sprites":
+            raise ValueError("unknown entity backend: %s" % backend)
+        self.flow = None
+        if pathing == "flow":
+            if self.horde is not None:
+                raise ValueError("flow pathing needs the sprites backend")
+            self.flow = pyBoxheadFlow.FlowField(field.get_size())
+        elif pathing != "straight":
+            raise ValueError("unknown zombie pathing: %s" % pathing)
+
+        self.tick = 0
+        self.zombies_killed = 0
+        self.player_damage = player_damage
+        self.wall_damage = wall_damage
+        # The wave table decides when waves change, and the scheduler plans
+        # the zombie spawns of the current wave.
+        if waves is None:
+            waves = pyBoxheadWaves.WaveTable()
+        self.waves = waves
+        self.scheduler = pyBoxheadWaves.SpawnScheduler(waves, self.random)
+        self.scheduler.start_wave(1, 0)
+        self.finished = False
+        # When interpolate is set, move() remembers where the player, zombies
+        # and bullets were, so draw() can place them between two steps.
+        self.interpolate = False
+        # A pyBoxheadProfiler.FrameProfiler to time each phase of a step, or
+        # None when the game is not being profiled.
+        self.profiler = None
+        # Lowered by a pyBoxheadQuality.QualityGovernor when the game is
+        # over budget: the most live zombies (None for the wave table's
+        # cap), and the HUD is refreshed every hud_every draws.
+        self.zombie_limit = None
+        self.hud_every = 1
+        self.__hud_wait = 0
+        self.__previous = {}
+        self.__between = []
+
+    def step(self, hat=None, shots=0, inputs=None):
+        '''This method advances the game by one tick. It takes the last
+        joystick hat value pressed this tick (or None), and the number of
+        button presses. In co-op, inputs is instead a list of (hat, shots)
+        pairs, one per player. It returns the state of the game after the
+        tick.'''
+        sounds = []
+        self.tick += 1
+        profiler = self.profiler
+        if inputs is None:
+            inputs = ((hat, shots),)
+
+        # Input: the hat changes the player direction, every button press
+        # fires a bullet from the player.
+        for player, (hat, shots) in zip(self.players, inputs):
+            if hat is not None:
+                player.change_direction(hat)
+            for shot in range(shots):
+                self.add_bullet(player.rect.centerx, player.rect.bottom)
+                sounds.append("gun_shot")
+        if profiler:
+            profiler.mark("input")
+
+        self.spawn_zombies()
+        if profiler:
+            profiler.mark("spawn")
+        self.check_waves(sounds)
+        if profiler:
+            profiler.mark("waves")
+        self.check_collisions(sounds)
+        self.check_game_over(sounds)
+        self.move()
+        if profiler:
+            profiler.mark("update")
+        return self.state(sounds)
+
+    def add_bullet(self, x, y):
+        '''This method creates a bullet and adds it to its groups.'''
+        if self.horde is not None:
+            self.horde.fire(x, y)
+            return
+        bullet = self.bulletPool.acquire(x, y)
+        self.bulletGroup.add(bullet)
+        self.allSprites.add(bullet, layer=3)
+
+    def add_zombie(self, x):
+        '''This method creates a zombie and adds it to its groups.'''
+        self.add_zombies((x,))
+
+    def add_zombies(self, xs):
+        '''This method creates a batch of zombies at the given x positions.'''
+        if self.horde is not None:
+            self.horde.spawn_zombies(xs)
+            return
+        for x in xs:
+            zombie = self.zombiePool.acquire(x)
+            self.zombieGroup.add(zombie)
+            self.allSprites.add(zombie, layer=2)
+
+    def add_explosion(self, x, y):
+        '''This method starts an explosion centred on (x, y).'''
+        self.explosions.add(x, y, self.tick)
+
+    def spawn_zombies(self):
+        '''This method spawns the zombies the scheduler planned for this tick,
+        all in one batch. The scheduler keeps the number of live zombies
+        under the cap of the wave table.'''
+        count = self.scheduler.due(self.tick, self.zombie_count(), self.zombie_limit)
+        if count:
+            # Zombie x position is randomly generated to make sure that the
+            # player cannot predict where the zombies spawn.
+            right = self.field.get_width() - 18
+            self.add_zombies([self.random.randrange(20, right) for zombie in range(count)])
+
+    def check_waves(self, sounds):
+        '''Once enough zombies are killed for the next wave in the wave table,
+        the wave increase sound effect is played, the new wave level is
+        displayed to the user, and the spawns of the new wave are planned.'''
+        next_wave = self.wave_level.get_wave() + 1
+        while self.zombies_killed >= self.waves.wave(next_wave)["kills"]:
+            self.wave_level.wave_increase()
+            sounds.append("next_wave")
+            self.scheduler.start_wave(next_wave, self.tick)
+            next_wave += 1
+
+    def check_collisions(self, sounds):
+        '''This method checks bullets, the wall and the player against the
+        zombies. Every hit creates an explosion and kills the zombie.'''
+        if self.horde is not None:
+            self.check_horde_collisions(sounds)
+            return
+        profiler = self.profiler
+
+        # The zombie grid is rebuilt once per tick, so each collision check
+        # only tests the zombies near the bullet, wall or player.
+        self.zombieGrid.rebuild(self.zombieGroup)
+        if profiler:
+            profiler.mark("broadphase")
+
+        # Collision Detection (Bullet on Zombie)
+        # Explosion is created at zombie location, zombie and bullet are killed.
+        for bullet in self.bulletGroup:
+            for zombie in self.zombieGrid.query(bullet.rect):
+                self.add_explosion(bullet.rect.centerx, bullet.rect.centery)
+                sounds.append("explosion_sound")
+                zombie.kill()
+                self.zombieGrid.remove(zombie)
+                bullet.kill()
+                self.zombies_killed += 1
+        if profiler:
+            profiler.mark("collide_bullets")
+
+        # Collision Detection (Wall on Zombie)
+        # Explosion is created at zombie location, zombie is killed.
+        for zombie in self.zombieGrid.query(self.endzone.rect):
+            self.add_explosion(zombie.rect.centerx, zombie.rect.centery)
+            sounds.append("explosion_sound")
+            zombie.kill()
+            self.zombieGrid.remove(zombie)
+            self.wall_level.wall_hit(self.wall_damage)
+        if profiler:
+            profiler.mark("collide_wall")
+
+        # Collision Detection (Player on Zombie)
+        # Explosion is created at zombie location, zombie is killed, player takes damage.
+        for player in self.players:
+            for zombie in self.zombieGrid.query(player.rect):
+                self.add_explosion(zombie.rect.centerx, zombie.rect.centery)
+                sounds.append("explosion_sound")
+                zombie.kill()
+                self.zombieGrid.remove(zombie)
+                self.health_level.player_hit(self.player_damage)
+        if profiler:
+            profiler.mark("collide_player")
+
+    def check_horde_collisions(self, sounds):
+        '''This method runs the same three collision checks as
+        check_collisions(), one array operation each, on the horde.'''
+        profiler = self.profiler
+        for x, y in self.horde.collide_bullets():
+            self.add_explosion(x, y)
+            sounds.append("explosion_sound")
+            self.zombies_killed += 1
+        if profiler:
+            profiler.mark("collide_bullets")
+        for x, y in self.horde.collide_rect(self.endzone.rect):
+            self.add_explosion(x, y)
+            sounds.append("explosion_sound")
+            self.wall_level.wall_hit(self.wall_damage)
+        if profiler:
+            profiler.mark("collide_wall")
+        for player in self.players:
+            for x, y in self.horde.collide_rect(player.rect):
+                self.add_explosion(x, y)
+                sounds.append("explosion_sound")
+                self.health_level.player_hit(self.player_damage)
+        if profiler:
+            profiler.mark("collide_player")
+
+    def check_game_over(self, sounds):
+        '''If the player or the wall has died, the game over sprite is shown,
+        the game over sound effect is played and the game is finished.'''
+        # If the health_level meets the death condition, explosion is created
+        # at player location, kill the player, play player death sound effect.
+        if self.health_level.death():
+            for player in self.players:
+                self.add_explosion(player.rect.centerx, player.rect.centery)
+                player.kill()
+            sounds.append("player_death")
+            self.finished = True
+        if self.wall_level.death():
+            self.finished = True
+        if self.finished:
+            # The game_over sprite is drawn on top of everything else.
+            self.allSprites.add(self.game_over, layer=5)
+            sounds.append("gameover_voice")
+
+    def move(self):
+        '''This method moves every sprite that moves on its own.'''
+        if self.interpolate:
+            previous = {}
+            for sprite in self.zombieGroup:
+                previous[sprite] = sprite.rect.topleft
+            for sprite in self.bulletGroup:
+                previous[sprite] = sprite.rect.topleft
+            for player in self.players:
+                previous[player] = player.rect.topleft
+            self.__previous = previous
+        for player in self.players:
+            if player.alive():
+                player.update()
+        if self.horde is not None:
+            self.horde.move()
+        if self.flow is not None:
+            self.move_zombies_by_flow()
+        elif self.arena is not None:
+            self.move_zombies_by_distance()
+        else:
+            self.zombieGroup.update()
+        self.bulletGroup.update()
+        self.explosions.update(self.tick)
+
+    def refresh_hud(self):
+        '''This method refreshes the HUD, once every hud_every calls.'''
+        self.__hud_wait -= 1
+        if self.__hud_wait <= 0:
+            self.__hud_wait = self.hud_every
+            self.hudGroup.update()
+
+    def move_zombies_by_distance(self):
+        '''This method moves the zombies in a large arena. Zombies near the
+        player's view move every tick; the others take turns, a quarter of
+        them each tick (with FAR_RATE 4), and move FAR_RATE ticks at once.'''
+        near = self.camera.view_at(self.player.rect.center).inflate(2 * FAR_MARGIN, 2 * FAR_MARGIN)
+        turn = self.tick % FAR_RATE
+        for zombie in self.zombieGroup.sprites():
+            if near.colliderect(zombie.rect):
+                zombie.update()
+            elif zombie.serial % FAR_RATE == turn:
+                zombie.update(FAR_RATE)
+
+    def move_zombies_by_flow(self):
+        '''This method moves the zombies along the flow field, after it has
+        followed the players. In a large arena, far zombies take turns as
+        in move_zombies_by_distance().'''
+        flow = self.flow
+        targets = [player.rect.center for player in self.players if player.alive()]
+        flow.track(targets)
+        zombies = self.zombieGroup.sprites()
+        moves = flow.moves([(zombie.x, zombie.y) for zombie in zombies], ZOMBIE_SPEED, targets)
+        if self.camera is None:
+            for zombie, (dx, dy) in zip(zombies, moves):
+                zombie.walk(dx, dy)
+            return
+        near = self.camera.view_at(self.player.rect.center).inflate(2 * FAR_MARGIN, 2 * FAR_MARGIN)
+        turn = self.tick % FAR_RATE
+        for zombie, (dx, dy) in zip(zombies, moves):
+            if near.colliderect(zombie.rect):
+                zombie.walk(dx, dy)
+            elif zombie.serial % FAR_RATE == turn:
+                zombie.walk(dx * FAR_RATE, dy * FAR_RATE)
+
+    def draw(self, surface, alpha=1.0):
+        '''This method refreshes the HUD and draws every sprite that changed,
+        and the explosions. alpha is how far the frame is between the last
+        step and the next one; with interpolate set, moving sprites are
+        drawn that far between their previous and current positions. It
+        returns the list of changed rects. In a large arena the whole
+        screen is drawn every time.'''
+        if self.camera is not None:
+            surface.blits(self.render_list(alpha), False)
+            return [surface.get_rect()]
+        self.refresh_hud()
+        # Explosions change every frame, so where they were drawn last frame
+        # is redrawn from the background and sprites.
+        for rect in self.explosions.drawn():
+            self.allSprites.repaint_rect(rect)
+        rects = self.__draw_sprites(surface, alpha)
+        drawn = self.explosions.draw(surface, self.tick)
+        if drawn:
+            # Sprites above the explosion layer (game over, profiler
+            # overlay) go back on top of the explosions.
+            for layer in self.allSprites.layers():
+                if layer > EXPLOSION_LAYER:
+                    for sprite in self.allSprites.get_sprites_from_layer(layer):
+                        if sprite.visible and sprite.rect.collidelist(drawn) != -1:
+                            surface.blit(sprite.image, sprite.rect)
+            rects = rects + drawn
+        return rects
+
+    def __draw_sprites(self, surface, alpha):
+        '''This method draws the sprites for draw(), and returns the list of
+        changed rects.'''
+        # Sprites drawn between two positions last frame are redrawn, so none
+        # is left behind once it stops moving.
+        for sprite in self.__between:
+            if sprite.dirty == 0:
+                sprite.dirty = 1
+        self.__between = []
+        if self.interpolate and alpha < 1.0 and self.horde is None:
+            moved = []
+            for sprite, (x, y) in self.__previous.items():
+                current = sprite.rect.topleft
+                if current != (x, y) and sprite.alive():
+                    moved.append((sprite, current))
+                    sprite.rect.topleft = (int(round(x + (current[0] - x) * alpha)),
+                                           int(round(y + (current[1] - y) * alpha)))
+                    if sprite.dirty == 0:
+                        sprite.dirty = 1
+            rects = self.allSprites.draw(surface)
+            # Put the sprites back where the rules left them.
+            for sprite, current in moved:
+                sprite.rect.topleft = current
+                self.__between.append(sprite)
+            return rects
+        if self.horde is not None:
+            # The horde is not tracked by the render group, so the whole
+            # screen is repainted and the horde is blitted over it.
+            self.allSprites.repaint_rect(surface.get_rect())
+            self.allSprites.draw(surface)
+            self.horde.draw(surface)
+            return [surface.get_rect()]
+        return self.allSprites.draw(surface)
+
+    def render_list(self, alpha=1.0):
+        '''This method refreshes the HUD and returns everything to draw, from
+        the bottom up, as (image, topleft[, area]) tuples like Surface.blits()
+        takes. It is for renderers that draw the whole frame every time
+        instead of the changed rects; alpha is used as in draw().'''
+        self.refresh_hud()
+        previous = {}
+        if self.interpolate and alpha < 1.0:
+            previous = self.__previous
+        if self.camera is not None:
+            return self.__arena_render_list(alpha, previous)
+        # What is not a sprite is drawn in place of its layer.
+        extras = {EXPLOSION_LAYER: self.explosions.sequence(self.tick)}
+        if self.horde is not None:
+            extras[2] = self.horde.zombies.sequence()
+            extras[3] = self.horde.bullets.sequence()
+        sequence = []
+        for layer in sorted(set(self.allSprites.layers()) | set(extras)):
+            for sprite in self.allSprites.get_sprites_from_layer(layer):
+                if not sprite.visible:
+                    continue
+                x, y = sprite.rect.topleft
+                if sprite in previous:
+                    old_x, old_y = previous[sprite]
+                    x = int(round(old_x + (x - old_x) * alpha))
+                    y = int(round(old_y + (y - old_y) * alpha))
+                sequence.append((sprite.image, (x, y), sprite.source_rect))
+            sequence.extend(extras.get(layer, ()))
+        return sequence
+
+    def __arena_render_list(self, alpha, previous):
+        '''This method returns render_list() for a large arena: the
+        background chunks in view, the sprites and effects in view at their
+        screen position, then the bottom band, the HUD and the layers above
+        the explosions, fixed to the screen.'''
+        camera = self.camera
+        player = self.player
+        x, y = player.rect.center
+        if player in previous:
+            old_x, old_y = previous[player]
+            x += int(round((old_x - player.rect.x) * (1.0 - alpha)))
+            y += int(round((old_y - player.rect.y) * (1.0 - alpha)))
+        camera.follow((x, y))
+        background = self.arena.background()
+        sequence = background.sequence(camera.view)
+        # Chunks about to come in view are built a few at a time.
+        background.warm(camera.view, budget=pyBoxheadArena.WARM_BUDGET)
+        fixed = [(background.panel, (0, camera.view.height - background.panel.get_height()))]
+        extras = {EXPLOSION_LAYER: self.explosions.sequence(self.tick)}
+        if self.horde is not None:
+            extras[2] = self.horde.zombies.sequence()
+            extras[3] = self.horde.bullets.sequence()
+        hud = self.hudGroup
+        for layer in sorted(set(self.allSprites.layers()) | set(extras)):
+            world = []
+            for sprite in self.allSprites.get_sprites_from_layer(layer):
+                if not sprite.visible:
+                    continue
+                x, y = sprite.rect.topleft
+                if sprite in previous:
+                    old_x, old_y = previous[sprite]
+                    x = int(round(old_x + (x - old_x) * alpha))
+                    y = int(round(old_y + (y - old_y) * alpha))
+                if layer > EXPLOSION_LAYER or sprite in hud:
+                    fixed.append((sprite.image, (x, y), sprite.source_rect))
+                else:
+                    world.append((sprite.image, (x, y), sprite.source_rect))
+            world.extend(extras.get(layer, ()))
+            # Only what the camera sees is drawn.
+            sequence.extend(camera.place(world))
+        return sequence + fixed
+
+    def pool_stats(self):
+        '''This method returns the stats of the bullet and zombie pools, to
+        help size them per wave.'''
+        return {"bullets": self.bulletPool.stats(),
+                "zombies": self.zombiePool.stats()}
+
+    def zombie_count(self):
+        '''This method returns the number of live zombies.'''
+        if self.horde is not None:
+            return len(self.horde.zombies)
+        return len(self.zombieGroup)
+
+    def bullet_count(self):
+        '''This method returns the number of bullets in flight.'''
+        if self.horde is not None:
+            return len(self.horde.bullets)
+        return len(self.bulletGroup)
+
+    def state(self, sounds=()):
+        '''This method returns a dictionary describing the game right now.'''
+        return {"tick": self.tick,
+                "zombies_killed": self.zombies_killed,
+                "wave": self.wave_level.get_wave(),
+                "player_health": self.health_level.get_health(),
+                "wall_health": self.wall_level.get_health(),
+                "player": self.player.rect.center,
+                "players": [player.rect.center for player in self.players],
+                "zombies": self.zombie_count(),
+                "bullets": self.bullet_count(),
+                "explosions": len(self.explosions),
+                "sounds": sounds,
+                "finished": self.finished}
+
+def headless_screen():
+    '''This function sets up pygame with the SDL dummy video and audio
+    drivers, so the game can run without a window or a sound card. It
+    returns the dummy screen surface.'''
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    pygame.display.init()
+    pygame.font.init()
+    return pygame.display.set_mode(SCREEN_SIZE)
+
+def simulate(inputs, seed=None, max_ticks=None, screen=None, backend="sprites", waves=None,
+             player_damage=10, wall_damage=5):
+    '''This function runs a game without a frame rate cap and yields the state
+    after every tick. inputs is either a sequence of (hat, shots) pairs, one
+    per tick, or a function that takes the last state and returns the
+    (hat, shots) pair for the next tick. The game stops when it is finished,
+    when the inputs run out, or after max_ticks ticks.'''
+    if screen is None:
+        screen = headless_screen()
+    simulation = Simulation(screen, seed, backend, waves, player_damage, wall_damage)
+    state = simulation.state()
+    if callable(inputs):
+        policy = inputs
+    else:
+        script = iter(inputs)
+        policy = lambda state: next(script, None)
+    while not simulation.finished and (max_ticks is None or simulation.tick < max_ticks):
+        tick_input = policy(state)
+        if tick_input is None:
+            break
+        hat, shots = tick_input
+        state = simulation.step(hat, shots)
+        yield state
+
+def random_policy(seed=None, fire_chance=0.2):
+    '''This function returns a simple input policy that wanders with the hat
+    and fires at random, for soak tests and balance runs.'''
+    rng = random.Random(seed)
+    def policy(state):
+        hat = None
+        if rng.random() < 0.05:
+            hat = (rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)))
+        shots = 1 if rng.random() < fire_chance else 0
+        return hat, shots
+    return policy
+
+def sweep_policy(fire_every=4, margin=40):
+    '''This function returns a scripted input policy that walks the player
+    from one side of the screen to the other and back, firing a bullet
+    every fire_every ticks.'''
+    # Current hat direction, and the tick the policy is on.
+    walk = {"hat": (1, 0), "tick": 0}
+    def policy(state):
+        walk["tick"] += 1
+        hat = None
+        x = state["player"][0]
+        if x <= margin and walk["hat"] != (1, 0):
+            walk["hat"] = hat = (1, 0)
+        elif x >= SCREEN_SIZE[0] - margin and walk["hat"] != (-1, 0):
+            walk["hat"] = hat = (-1, 0)
+        elif walk["tick"] == 1:
+            hat = walk["hat"]
+        shots = 1 if walk["tick"] % fire_every == 0 else 0
+        return hat, shots
+    return policy
+
+if __name__ == "__main__":
+    import argparse, time
+    parser = argparse.ArgumentParser(description="Run pyBoxhead headless with a random player.")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--ticks", type=int, default=None, help="stop after this many ticks")
+    parser.add_argument("--backend", choices=("sprites", "numpy"), default="sprites")
+    parser.add_argument("--waves", help="JSON wave table to play instead of the default waves")
+    args = parser.parse_args()
+    waves = None
+    if args.waves:
+        waves = pyBoxheadWaves.load_wave_table(args.waves)
+    start = time.time()
+    state = None
+    for state in simulate(random_policy(args.seed), args.seed, args.ticks, backend=args.backend, waves=waves):
+        pass
+    elapsed = time.time() - start
+    if state is not None:
+        print("%d ticks in %.2f s (%.0f ticks/s): wave %d, %d kills, player %d, wall %d" % (
+            state["tick"], elapsed, state["tick"] / max(elapsed, 1e-9), state["wave"],
+            state["zombies_killed"], state["player_health"], state["wall_health"]))
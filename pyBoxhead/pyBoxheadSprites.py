@@ -14,20 +14,20 @@
     Python Logo: Python Software Foundation
     
 '''
-# Import OS in order to access explosion directory.
-import pygame, os
+import pygame
+# Images, sounds and fonts are loaded once and shared through the asset cache.
+from pyBoxheadAssets import assets
 
-class Player(pygame.sprite.Sprite):
+class Player(pygame.sprite.DirtySprite):
     '''This class defines the sprite for the Player'''
     def __init__(self, screen):
         '''This initializer takes a screen surface as a parameters.  
         It loads the player image.'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
          
         # Load player sprite.
-        self.image = pygame.image.load("player.png")
-        # Conversion not used to maintain transparency
+        self.image = assets.image("player.png")
         self.rect = self.image.get_rect()
         self.__screen = screen
         
@@ -50,6 +50,8 @@ class Player(pygame.sprite.Sprite):
     def update(self):
         ''' This method will be called automatically to reposition the player sprite
         on the screen.'''
+        # Remember where the player was drawn, so it is only redrawn if it moved.
+        old_position = self.rect.topleft
         
         #Check if player has reached side edges. If not, keep moving
         # player in the same x direction. If yes, don't change x position at all.
@@ -66,27 +68,54 @@ class Player(pygame.sprite.Sprite):
             self.rect.bottom = self.__screen.get_height()-102
         else:
             self.rect.centery += self.__dy*4        
+        if self.rect.topleft != old_position:
+            self.dirty = 1
         
-class Bullet(pygame.sprite.Sprite):
+class PooledSprite(pygame.sprite.DirtySprite):
+    '''This class is the base for sprites that are reused through a
+    pyBoxheadPool.SpritePool instead of being left for the garbage collector.'''
+    def __init__(self):
+        # Call the parent __init__() method
+        pygame.sprite.DirtySprite.__init__(self)
+        # The pool this sprite goes back to when it is killed, if any, and
+        # the pool's serial number for its current life.
+        self.pool = None
+        self.serial = 0
+
+    def kill(self):
+        '''This method removes the sprite from all its groups, and gives it
+        back to its pool. Killing a sprite twice only releases it once.'''
+        if self.alive():
+            pygame.sprite.DirtySprite.kill(self)
+            if self.pool is not None:
+                self.pool.release(self)
+
+class Bullet(PooledSprite):
     '''This class defines the sprite for the Bullet'''
     def __init__(self, screen, player_x, player_y):
         '''This initializer takes a screen surface, and player center x coords,
         and the player's rect bottom coord. '''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
+        PooledSprite.__init__(self)
          
         # Load bullet png.
-        self.image = pygame.image.load("bullet.png")
-        # Conversion not used to maintain transparency
+        self.image = assets.image("bullet.png")
         self.rect = self.image.get_rect()
         self.__screen = screen
+ 
+        # Set initial y vector.
+        self.__dy = 3 
+        self.reset(player_x, player_y)
+
+    def reset(self, player_x, player_y):
+        '''This method places the bullet at the player, for a new or a
+        reused bullet.'''
         # Bullet center position is set to the center x of the player, and
         # y is set to the coord of the players rect.bottom
         self.rect.centery = player_y
         self.rect.centerx = player_x
- 
-        # Set initial y vector.
-        self.__dy = 3 
+        # Bullets move every frame, so they are always redrawn.
+        self.dirty = 2
 
     def update(self):
         ''' This method will be called automatically to keep the bullet moving
@@ -99,106 +128,130 @@ class Bullet(pygame.sprite.Sprite):
         else:
             self.rect.centery += self.__dy*6
 
-class Zombie(pygame.sprite.Sprite):
+class Zombie(PooledSprite):
     ''' This class defines the sprite for the Zombie'''
     def __init__(self, screen, zombie_x):
         '''This initializer takes a screen surface, and a randomly generated x
         coordinate as parameters. '''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
+        PooledSprite.__init__(self)
          
         # Load the zombie sprite.
-        self.image = pygame.image.load("zombie.png")
-        # Conversion not used to maintain transparency
+        self.image = assets.image("zombie.png")
         self.rect = self.image.get_rect()
         self.__screen = screen
-        
+ 
+        # Set initial y vector. Y vector is negative since the sprite is moving
+        # from bottom to top
+        self.__dy = -1
+        self.reset(zombie_x)
+
+    def reset(self, zombie_x):
+        '''This method places the zombie on the bottom edge, for a new or a
+        reused zombie.'''
         # Initial Zombie y position is set to the bottom of the screen edge,
         # x position is randomly generated, so that the player cannot predict
         # where the zombie spawns
         self.rect.bottom = self.__screen.get_height()-102
         self.rect.centerx = zombie_x
- 
-        # Set initial y vector. Y vector is negative since the sprite is moving
-        # from bottom to top
-        self.__dy = -1
+        # Exact centre, for zombies that walk along a flow field.
+        self.x = float(self.rect.centerx)
+        self.y = float(self.rect.centery)
+        # Zombies move every frame, so they are always redrawn.
+        self.dirty = 2
 
-    def update(self):
+    def update(self, steps=1):
         ''' This method will be called automatically to reposition the zombie sprite
-        on the screen.'''
+        on the screen. A zombie far from the player in a large arena is
+        updated every few ticks, and moves steps ticks' worth at once.'''
         
         # Check if zombie sprite has reached the top wall. If reached top wall,
         # do not let it go further. If havent reached top, keep moving the zombie.
-        
-        if self.rect.top < 30:
-            self.rect.top = 30
-        else:
-            self.rect.centery += self.__dy*1.25
-            
+        # The rect only holds whole pixels, so each tick's move is made on its
+        # own: one move of steps ticks would round differently and be faster.
+        for step in range(steps):
+            if self.rect.top < 30:
+                self.rect.top = 30
+            else:
+                self.rect.centery += self.__dy*1.25
+
+    def walk(self, dx, dy):
+        '''This method moves the zombie by (dx, dy) pixels, e.g. along a flow
+        field, keeping fractions of a pixel for the next move. Zombies stay
+        between the side edges and above the bottom edge they spawn on.'''
+        half_width = self.rect.width / 2.0
+        self.x = min(max(self.x + dx, half_width), self.__screen.get_width() - half_width)
+        self.y = min(self.y + dy, self.__screen.get_height() - 102 - self.rect.height / 2.0)
+        self.rect.center = (int(round(self.x)), int(round(self.y)))
             
-class Explosion(pygame.sprite.Sprite):
-    ''' This class defines the explosion sprite.'''
-    def __init__(self, screen, object_x, object_y):
-        '''This initializer takes a screen surface, and the object x and y as
-        parameters.'''
-        
-        # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
-        # Explosion List, adds all 17 frames of the explosion to a list
-        self.__explosions = []
-        for current_frame in range(1,17):
-            explosions = pygame.image.load(os.path.join("explosions","explosion" + str(current_frame) + ".png"))
-            self.__explosions.append(explosions)
-        # counter is created to keep track of the number of frames that have been displayed.
-        self.__counter = 0       
-        
-        # initial image is loaded.    
-        self.image = pygame.image.load(os.path.join("explosions","explosion1.png"))
-        # Conversion not used to maintain transparency
-        
-        # explosion location is at object coords.
-        self.rect = self.image.get_rect()
-        self.__screen = screen
-        self.rect.centery = object_y
-        self.rect.centerx = object_x
-        
-    def update(self):
-        ''' The update method cycles through all 16 frames of the explosion
-        until the last frame is reached, then it kills itself'''
-        if self.__counter < 16:
-            self.image = self.__explosions[self.__counter]
-            self.__counter += 1
-        else:
-            self.kill()
             
-class EndZone (pygame.sprite.Sprite):
+class EndZone (pygame.sprite.DirtySprite):
     def __init__(self, screen):
         
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
          
         # Our endzone sprite will be a 1 pixel wide black line.
         self.__screen = screen
         self.image = pygame.Surface((self.__screen.get_width(), 30))
-        self.image = self.image.convert()
+        # There is no display surface to convert to when drawing with textures.
+        if pygame.display.get_surface() is not None:
+            self.image = self.image.convert()
         self.image.fill((0, 0, 0))
         self.image.set_colorkey((0,0,0))
         self.rect = self.image.get_rect()
         
-class PlayerKeeper(pygame.sprite.Sprite):
+class HudText(object):
+    '''This class draws a label followed by a number, e.g. "Wall Health: 95".
+    The label and the digits are rendered with the font once, and a new value
+    is drawn by copying the cached digit surfaces next to the label. The
+    surface for every value shown so far is kept, so showing a value again
+    costs nothing.'''
+    def __init__(self, font, label, color):
+        '''This initializer takes a font, the label text and the text color.'''
+        self.__label = font.render(label, 1, color)
+        self.__glyphs = {}
+        for character in "-0123456789":
+            self.__glyphs[character] = font.render(character, 1, color)
+        self.__images = {}
+
+    def render(self, value):
+        '''This method returns the surface showing the label and value.'''
+        image = self.__images.get(value)
+        if image is not None:
+            return image
+        pieces = [self.__label] + [self.__glyphs[character] for character in "%d" % value]
+        width = sum([piece.get_width() for piece in pieces])
+        height = max([piece.get_height() for piece in pieces])
+        image = pygame.Surface((width, height), pygame.SRCALPHA)
+        # The pieces never overlap, so their pixels are copied as they are
+        # instead of being alpha blended onto the empty surface.
+        sequence = []
+        x = 0
+        for piece in pieces:
+            sequence.append((piece, (x, 0), None, pygame.BLEND_RGBA_MAX))
+            x += piece.get_width()
+        image.blits(sequence, False)
+        self.__images[value] = image
+        return image
+
+class PlayerKeeper(pygame.sprite.DirtySprite):
     def __init__(self):
         '''This initializer loads the custom font "Captain Redemption", and
         sets the starting Player Health to 100'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
  
         # Load our custom font, and initialize the starting health.
-        self.__font = pygame.font.Font("zombiefont.ttf", 64)
+        self.__text = HudText(assets.font("zombiefont.ttf", 64), "Player Health: ", (193, 1, 1))
         self.__player_health = 100
+        # Value currently drawn, the text is only redrawn when it changes.
+        self.__shown = None
         
-    def player_hit(self):
-        '''This method when called subtracts 10 from the players health'''
-        self.__player_health -= 10
+    def player_hit(self, damage=10):
+        '''This method when called subtracts damage (10 by default) from the
+        players health'''
+        self.__player_health -= damage
      
     def death(self):
         '''This method returns whether the player has died or not'''
@@ -206,29 +259,38 @@ class PlayerKeeper(pygame.sprite.Sprite):
             return True
         else:
             return False
+
+    def get_health(self):
+        '''This method returns the current player health'''
+        return self.__player_health
  
     def update(self):
         '''This method will be called automatically to display 
         the current health at the bottom of the game window.'''
-        message = "Player Health: %d" % (self.__player_health)
-        self.image = self.__font.render(message, 1, (193, 1, 1))
-        self.rect = self.image.get_rect()
-        self.rect.center = (153, 498)      
+        if self.__player_health != self.__shown:
+            self.__shown = self.__player_health
+            self.image = self.__text.render(self.__shown)
+            self.rect = self.image.get_rect()
+            self.rect.center = (153, 498)
+            self.dirty = 1
 
-class WallKeeper(pygame.sprite.Sprite):
+class WallKeeper(pygame.sprite.DirtySprite):
     def __init__(self):
         '''This initializer loads the custom font "Captain Redemption", and
         sets the starting wall Health to 100'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
  
         # Load our custom font, and initialize the starting health.
-        self.__font = pygame.font.Font("zombiefont.ttf", 64)
+        self.__text = HudText(assets.font("zombiefont.ttf", 64), "Wall Health: ", (193, 1, 1))
         self.__wall_health = 100
+        # Value currently drawn, the text is only redrawn when it changes.
+        self.__shown = None
         
-    def wall_hit(self):
-        '''This method subtracts 5 from the health of the wall'''
-        self.__wall_health -= 5
+    def wall_hit(self, damage=5):
+        '''This method subtracts damage (5 by default) from the health of
+        the wall'''
+        self.__wall_health -= damage
      
     def death(self):
         '''This method returns wheter the wall has been demolished or not'''
@@ -236,47 +298,61 @@ class WallKeeper(pygame.sprite.Sprite):
             return True
         else:
             return False
+
+    def get_health(self):
+        '''This method returns the current wall health'''
+        return self.__wall_health
  
     def update(self):
         '''This method will be called automatically to display 
         the current health of the wall at the bottom of the game window.'''
-        message = "Wall Health: %d" % (self.__wall_health)
-        self.image = self.__font.render(message, 1, (193, 1, 1))
-        self.rect = self.image.get_rect()
-        self.rect.center = (172, 535)     
+        if self.__wall_health != self.__shown:
+            self.__shown = self.__wall_health
+            self.image = self.__text.render(self.__shown)
+            self.rect = self.image.get_rect()
+            self.rect.center = (172, 535)
+            self.dirty = 1
         
-class WaveKeeper(pygame.sprite.Sprite):
+class WaveKeeper(pygame.sprite.DirtySprite):
     def __init__(self):
         '''This initializer loads the custom font "Captain Redemption", and
         sets the starting Zombie Wave to 1'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
  
         # Load our custom font, and initialize the starting wave.
-        self.__font = pygame.font.Font("zombiefont.ttf", 64)
+        self.__text = HudText(assets.font("zombiefont.ttf", 64), "Current Wave: ", (193, 1, 1))
         self.__wave = 1
+        # Value currently drawn, the text is only redrawn when it changes.
+        self.__shown = None
         
     def wave_increase(self):
         '''This method adds one to the score for current wave'''
         self.__wave += 1
+
+    def get_wave(self):
+        '''This method returns the current wave'''
+        return self.__wave
  
     def update(self):
         '''This method will be called automatically to display 
         the current wave at the bottom of the game window.'''
-        message = "Current Wave: %d" % (self.__wave)
-        self.image = self.__font.render(message, 1, (193, 1, 1))
-        self.rect = self.image.get_rect()
-        self.rect.center = (508, 531)
+        if self.__wave != self.__shown:
+            self.__shown = self.__wave
+            self.image = self.__text.render(self.__shown)
+            self.rect = self.image.get_rect()
+            self.rect.center = (508, 531)
+            self.dirty = 1
 
-class GameOver(pygame.sprite.Sprite):
+class GameOver(pygame.sprite.DirtySprite):
     def __init__(self):
         '''This initializer loads the custom font "Captain Redemption", and
         sets the game over message'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
  
         # Load our custom font, and initialize the game over message.
-        self.__font = pygame.font.Font("zombiefont.ttf", 115)
+        self.__font = assets.font("zombiefont.ttf", 115)
     
         message = "GAME OVER"
         self.image = self.__font.render(message, 1, (255, 0, 0))
@@ -0,0 +1,51 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Fixed timestep for pyBoxhead.
+
+    The game rules always advance in steps of 1/30 of a second, however fast
+    or slow the screen is drawn. Time since the last frame is added to an
+    accumulator, one simulation step is run for every whole step in it, and
+    the leftover fraction is used to draw sprites part way between their
+    previous and current positions.
+
+'''
+
+class FixedStep(object):
+    '''This class turns the time between frames into a number of fixed
+    simulation steps.'''
+    def __init__(self, rate=30, max_steps=5):
+        '''This initializer takes the number of simulation steps per second,
+        and the most steps to run in one frame. When a frame takes longer
+        than max_steps steps, the rest of the time is dropped, so one slow
+        frame cannot snowball into more and more catching up.'''
+        self.step_time = 1000.0 / rate
+        self.max_steps = max_steps
+        self.__accumulator = 0.0
+        self.__last = None
+        self.dropped = 0
+
+    def advance(self, now):
+        '''This method takes the current time in milliseconds (e.g.
+        pygame.time.get_ticks()), and returns how many simulation steps to
+        run this frame.'''
+        if self.__last is None:
+            # The first frame starts the clock with one step to run.
+            self.__last = now
+            self.__accumulator = self.step_time
+        self.__accumulator += now - self.__last
+        self.__last = now
+        steps = int(self.__accumulator // self.step_time)
+        if steps > self.max_steps:
+            self.dropped += steps - self.max_steps
+            steps = self.max_steps
+            self.__accumulator = 0.0
+        else:
+            self.__accumulator -= steps * self.step_time
+        return steps
+
+    def alpha(self):
+        '''This method returns how far the current frame is between the last
+        simulation step and the next one, from 0 up to 1.'''
+        return min(self.__accumulator / self.step_time, 1.0)
@@ -0,0 +1,151 @@
+''' Name: David Ye
+
+    Date: May 31, 2017
+
+    Description: Wave table and zombie spawn scheduler for pyBoxhead.
+
+    The waves are described by a table: how many kills reach each wave, how
+    many zombies per second spawn during it, and how big a spawn group can
+    be. Past the last row the table keeps scaling the waves up, so there is
+    no wave where the difficulty stops growing. The table can be loaded from
+    a JSON file with the same layout as DEFAULT_WAVES.
+
+    Instead of rolling a die every tick, the scheduler plans each wave's
+    spawns ahead of time as Poisson arrivals of spawn groups, and never lets
+    more than max_live_zombies zombies be alive at once.
+
+'''
+import collections, json
+
+# The original waves: 20, 35, 50, 75, 100 and 125 kills, with a spawning
+# chance of 1 in 49 per tick dropping to 1 in 19, i.e. 30/49 to 30/19
+# zombies per second at 30 ticks per second.
+DEFAULT_WAVES = {
+    "waves": [{"kills": 0, "spawns_per_second": 0.61, "burst": 1},
+              {"kills": 20, "spawns_per_second": 0.68, "burst": 1},
+              {"kills": 35, "spawns_per_second": 0.77, "burst": 1},
+              {"kills": 50, "spawns_per_second": 0.88, "burst": 1},
+              {"kills": 75, "spawns_per_second": 1.03, "burst": 1},
+              {"kills": 100, "spawns_per_second": 1.25, "burst": 1},
+              {"kills": 125, "spawns_per_second": 1.58, "burst": 1}],
+    # How the waves keep growing after the last row.
+    "after_last": {"kills_per_wave": 25,
+                   "rate_growth": 1.1,
+                   "max_spawns_per_second": 6.0,
+                   "burst_every": 3,
+                   "max_burst": 5},
+    "max_live_zombies": 100}
+
+class WaveTable(object):
+    '''This class answers what each wave looks like, from the table rows and,
+    past the last row, from the growth rules.'''
+    def __init__(self, table=DEFAULT_WAVES):
+        '''This initializer takes a table laid out like DEFAULT_WAVES.'''
+        # The table as given, e.g. to save it with a recorded game.
+        self.table = table
+        self.__rows = [dict(row) for row in table["waves"]]
+        if not self.__rows:
+            raise ValueError("a wave table needs at least one wave")
+        self.__after = dict(DEFAULT_WAVES["after_last"])
+        self.__after.update(table.get("after_last", {}))
+        # The game moves on a wave each time the kills reach the next one, so
+        # a wave that needs no more kills than the one before would be
+        # skipped over without end.
+        for before, row in zip(self.__rows, self.__rows[1:]):
+            if row["kills"] <= before["kills"]:
+                raise ValueError("wave kills must go up, not from %s to %s" % (before["kills"], row["kills"]))
+        if self.__after["kills_per_wave"] < 1:
+            raise ValueError("kills_per_wave must be at least 1, not %s" % self.__after["kills_per_wave"])
+        if self.__after["rate_growth"] <= 0:
+            raise ValueError("rate_growth must be above 0, not %s" % self.__after["rate_growth"])
+        self.max_live_zombies = table.get("max_live_zombies", DEFAULT_WAVES["max_live_zombies"])
+
+    def wave(self, number):
+        '''This method returns the row for wave number (starting at 1) as a
+        dictionary with kills, spawns_per_second and burst.'''
+        if number <= len(self.__rows):
+            return self.__rows[number - 1]
+        last = self.__rows[-1]
+        after = self.__after
+        extra = number - len(self.__rows)
+        rate = min(last["spawns_per_second"] * after["rate_growth"] ** extra,
+                   after["max_spawns_per_second"])
+        burst = min(last.get("burst", 1) + extra // after["burst_every"], after["max_burst"])
+        return {"kills": last["kills"] + extra * after["kills_per_wave"],
+                "spawns_per_second": rate,
+                "burst": burst}
+
+def load_wave_table(filename):
+    '''This function loads a wave table from a JSON file.'''
+    with open(filename) as wave_file:
+        return WaveTable(json.load(wave_file))
+
+class SpawnScheduler(object):
+    '''This class plans when zombies spawn. Spawn groups arrive as a Poisson
+    process at the rate of the current wave, each group holding 1 to burst
+    zombies, and the plan is computed horizon ticks ahead.'''
+    def __init__(self, table, rng, tick_rate=30, horizon=300):
+        '''This initializer takes the WaveTable, the random number generator
+        of the game, the ticks per second and the planning horizon in ticks.'''
+        self.__table = table
+        self.__random = rng
+        self.__tick_rate = tick_rate
+        self.__horizon = horizon
+        self.__timeline = collections.deque()
+        self.__group_rate = 0.0
+        self.__burst = 1
+        self.__next_arrival = 0.0
+        self.__planned_until = 0
+        self.dropped = 0
+
+    def start_wave(self, number, tick):
+        '''This method throws away the plan of the previous wave and plans
+        the spawns of wave number from tick onwards.'''
+        wave = self.__table.wave(number)
+        self.__burst = max(1, int(wave.get("burst", 1)))
+        # Groups hold (burst + 1) / 2 zombies on average, so groups arrive
+        # that much less often than zombies.
+        zombies_per_tick = wave["spawns_per_second"] / float(self.__tick_rate)
+        self.__group_rate = zombies_per_tick * 2.0 / (self.__burst + 1)
+        self.__timeline.clear()
+        self.__planned_until = tick
+        self.__next_arrival = tick + self.__gap()
+        self.__plan(tick + self.__horizon)
+
+    def __gap(self):
+        '''This method returns the ticks until the next group arrives.'''
+        if self.__group_rate <= 0:
+            return float("inf")
+        return self.__random.expovariate(self.__group_rate)
+
+    def __plan(self, until):
+        '''This method adds the groups arriving before tick until to the plan.'''
+        while self.__next_arrival < until:
+            size = self.__random.randint(1, self.__burst)
+            self.__timeline.append((int(self.__next_arrival) + 1, size))
+            self.__next_arrival += self.__gap()
+        self.__planned_until = until
+
+    def timeline(self):
+        '''This method returns the planned (tick, group size) arrivals.'''
+        return list(self.__timeline)
+
+    def due(self, tick, live, cap=None):
+        '''This method returns how many zombies spawn on tick, given the
+        number of zombies alive. Groups that would go over the live cap are
+        dropped, so a tick never spawns more than the cap allows. cap lowers
+        the cap of the wave table, e.g. when the game is over budget.'''
+        if self.__planned_until - tick < self.__horizon // 2:
+            self.__plan(tick + self.__horizon)
+        count = 0
+        timeline = self.__timeline
+        while timeline and timeline[0][0] <= tick:
+            count += timeline.popleft()[1]
+        limit = self.__table.max_live_zombies
+        if cap is not None:
+            limit = min(limit, cap)
+        room = max(0, limit - live)
+        if count > room:
+            self.dropped += count - room
+            count = room
+        return count